@@ -1,16 +1,31 @@
 """
 Example script to classify an image using a model from Edge Impulse.
 From: https://github.com/edgeimpulse/linux-sdk-python
+
+evaluate_model classifies a whole labelled test set with a model file, the
+local evaluation of the downloaded models in the pipeline (see finish_runs in
+utils/pipeline.py). It needs edge_impulse_linux and opencv-python, without
+them the pipeline skips it.
 """
-import cv2 # type: ignore
 import os
 import sys
 import argparse
-from edge_impulse_linux.image import ImageImpulseRunner # type: ignore
+
+try:
+    import cv2 # type: ignore
+    from edge_impulse_linux.image import ImageImpulseRunner # type: ignore
+except ImportError:
+    cv2 = ImageImpulseRunner = None
+
+
+def require_runner():
+    if ImageImpulseRunner is None:
+        raise ImportError("Running a model file needs edge_impulse_linux and opencv-python.")
 
 
 def run_model(modelfile, imgfile):
 
+    require_runner()
     runner = None
 
     with ImageImpulseRunner(modelfile) as runner:
@@ -65,6 +80,41 @@ def run_model(modelfile, imgfile):
                 runner.stop()
 
 
+def evaluate_model(modelfile, samples):
+    """
+    Classify labelled images with a model file. A sample counts as correct if its top label is the expected one.
+    samples: [(imgfile, label)]
+    Returns {"accuracyScore", "correct", "total", "result": [{"file", "label", "prediction", "score"}]}.
+    """
+    require_runner()
+    runner = None
+    results = []
+
+    with ImageImpulseRunner(modelfile) as runner:
+        try:
+            runner.init()
+            for imgfile, label in samples:
+                img = cv2.imread(imgfile)
+                if img is None:
+                    print('Failed to load image', imgfile)
+                    continue
+                features, cropped = runner.get_features_from_image_auto_studio_settings(
+                    cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+                scores = runner.classify(features)["result"].get("classification")
+                if scores is None:
+                    raise ValueError(modelfile + " is not a classification model.")
+                prediction = max(scores, key=scores.get)
+                results.append({"file": imgfile, "label": label, "prediction": prediction,
+                                "score": scores[prediction]})
+        finally:
+            if (runner):
+                runner.stop()
+
+    correct = sum(r["label"] == r["prediction"] for r in results)
+    return {"accuracyScore": 100 * correct / len(results) if results else -1,
+            "correct": correct, "total": len(results), "result": results}
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description='Classify an image using a model from Edge Impulse.')
@@ -0,0 +1,85 @@
+"""
+Runs an experiment described by a config file, see utils/experiment_plan.py.
+
+Usage:
+python run_experiment.py experiments/exp_2.json
+python run_experiment.py experiments/exp_2.json --dry-run                  # show the plan and its duration
+python run_experiment.py experiments/exp_2.json --schedule longest-first
+python run_experiment.py experiments/exp_2.json --schedule deadline --deadline 07:30
+python run_experiment.py experiments/exp_2.json --projects 3   # spread over up to 3 projects of EI_PROJECTS
+python run_experiment.py experiments/exp_2.json --queue /shared/queue.db   # only queue it, see run_worker.py
+python run_experiment.py experiments/exp_2.json --profile screening        # see utils/job_profiles.py
+While it runs, the API metrics are on http://127.0.0.1:9464/metrics, see utils/ei_metrics.py.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from dotenv import load_dotenv # type: ignore
+load_dotenv()
+
+from utils.duration_model import load_models
+from utils.ei_metrics import install_metrics
+from utils.experiment_journal import Journal
+from utils.experiment_plan import (SCHEDULES, estimate_plan, load_config, plan_experiment, print_plan, queue_plan,
+                                   run_plan, schedule)
+from utils.job_profiles import PROFILES
+from utils.job_status import install_cleanup
+from utils.project_pool import load_pool
+from utils.work_queue import WorkQueue
+
+
+def parse_deadline(value):
+    """A clock time (07:30, the next one) or a number of hours from now, as a timestamp."""
+    if ":" in value:
+        hour, minute = map(int, value.split(":"))
+        now = datetime.now()
+        deadline = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if deadline <= now:
+            deadline += timedelta(days=1)
+        return deadline.timestamp()
+    return time.time() + float(value) * 3600
+
+
+def run_experiment(config_path, dry_run=False, strategy="plan", deadline=None, max_projects=None, queue=None,
+                   profile=None):
+    config = load_config(config_path)
+    config["profile"] = profile or config["profile"]
+    print(f"Job profile: {config['profile']}")
+    journal = Journal()
+    pool = load_pool(max_projects)
+    plan = plan_experiment(config)
+    estimates = estimate_plan(plan, load_models(journal), journal, config["profile"])
+    plan, left_out = schedule(plan, estimates, strategy, deadline)
+    print_plan(plan, estimates, len(pool))
+    if left_out:
+        print(f"{len(left_out)} runs don't fit before the deadline and are left out: {', '.join(left_out)}")
+    if dry_run:
+        return {}
+    if queue:
+        queue_plan(plan, config, WorkQueue(queue))
+        return {}
+    # Ctrl-C or a kill cancels the jobs on the server, instead of leaving them running.
+    install_cleanup()
+    install_metrics()
+    return run_plan(plan, config, journal, pool=pool)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run an experiment grid on Edge Impulse.")
+    parser.add_argument("config", type=str, help="Path to the experiment config (JSON).")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the stages and how long they'd take.")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="plan", help="Order of the chunk selections.")
+    parser.add_argument("--deadline", type=parse_deadline, default=None,
+                        help="For --schedule deadline: a clock time like 07:30, or a number of hours.")
+    parser.add_argument("--projects", type=int, default=None, help="Use at most this many projects of the pool.")
+    parser.add_argument("--queue", type=str, default=None,
+                        help="Put the plan in this work queue for run_worker.py, instead of running it.")
+    parser.add_argument("--profile", choices=PROFILES, default=None,
+                        help="Job profile, instead of the one in the config.")
+    args = parser.parse_args()
+    if args.schedule == "deadline" and args.deadline is None:
+        parser.error("--schedule deadline needs a --deadline.")
+
+    run_experiment(args.config, dry_run=args.dry_run, strategy=args.schedule, deadline=args.deadline,
+                   max_projects=args.projects, queue=args.queue, profile=args.profile)
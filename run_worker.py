@@ -0,0 +1,36 @@
+"""
+Runs the tasks of an experiment from a work queue, see utils/work_queue.py.
+Start one worker per machine (or checkout), each with its own projects in EI_PROJECTS.
+
+Usage:
+python run_experiment.py experiments/exp_2.json --queue /shared/queue.db   # on one machine
+python run_worker.py /shared/queue.db exp_2                                # on every machine
+"""
+import argparse
+from dotenv import load_dotenv # type: ignore
+load_dotenv()
+
+from utils.ei_metrics import install_metrics
+from utils.experiment_journal import Journal
+from utils.experiment_plan import run_worker
+from utils.job_status import install_cleanup
+from utils.project_pool import load_pool
+from utils.work_queue import LEASE_SECONDS, WorkQueue
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run the tasks of an experiment from a work queue.")
+    parser.add_argument("queue", type=str, help="Path to the queue database.")
+    parser.add_argument("experiment", type=str, help="Name of the experiment, as in its config.")
+    parser.add_argument("--worker", type=str, default=None, help="Name of this worker, defaults to host:pid.")
+    parser.add_argument("--lease", type=float, default=LEASE_SECONDS,
+                        help="Seconds a task stays leased without a heartbeat.")
+    parser.add_argument("--projects", type=int, default=None, help="Use at most this many projects of the pool.")
+    args = parser.parse_args()
+
+    install_cleanup()
+    # Set EI_METRICS_PORT per worker to scrape several workers on one machine.
+    install_metrics()
+    run_worker(WorkQueue(args.queue), args.experiment, Journal(), load_pool(args.projects),
+               worker=args.worker, lease=args.lease)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The utils package is imported from the repository root, like the run_exp scripts do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
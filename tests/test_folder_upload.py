@@ -0,0 +1,48 @@
+import json
+import requests
+from utils.ei_folder_upload import upload_file
+
+
+class IngestionClient:
+    """Answers every upload with the given status and JSON body, and keeps the headers it got."""
+
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+        self.headers = []
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        self.headers.append(headers)
+        data.read()
+        res = requests.Response()
+        res.status_code = self.status
+        res._content = json.dumps(self.body).encode()
+        return res
+
+
+def sample(tmp_path):
+    path = tmp_path / "class1.0.jpg"
+    path.write_bytes(b"\xff\xd8 not really a jpeg")
+    return str(path)
+
+
+def test_upload(tmp_path):
+    client = IngestionClient(200, {"success": True, "files": [{"success": True, "fileName": "class1.0.jpg"}]})
+    assert upload_file(sample(tmp_path), client=client)
+    assert client.headers[0]["x-label"] == "class1"
+    assert client.headers[0]["x-disallow-duplicates"] == "1"
+
+
+def test_duplicate_counts_as_uploaded(tmp_path):
+    duplicate = "An item with this hash already exists (ids: 123)"
+    client = IngestionClient(200, {"success": True, "files": [{"success": False, "error": duplicate}]})
+    assert upload_file(sample(tmp_path), client=client)
+    client = IngestionClient(400, {"success": False, "error": duplicate})
+    assert upload_file(sample(tmp_path), client=client)
+
+
+def test_failed_upload(tmp_path):
+    client = IngestionClient(200, {"success": True, "files": [{"success": False, "error": "Invalid image"}]})
+    assert not upload_file(sample(tmp_path), client=client)
+    client = IngestionClient(500, {"success": False, "error": "Internal server error"})
+    assert not upload_file(sample(tmp_path), client=client)
@@ -0,0 +1,43 @@
+from utils.job_logs import TrainingMonitor, merge_rules
+
+
+class LogClient:
+    """Answers the stdout requests of a job with the given pages, one per call."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+
+    def call(self, method, path, description, **kwargs):
+        return self.pages.pop(0)
+
+
+def page(*lines, total=None):
+    # The API returns the newest line first.
+    stdout = [{"data": line} for line in reversed(lines)]
+    return {"success": True, "stdout": stdout, "totalCount": len(lines) if total is None else total}
+
+
+EPOCHS = ("Epoch 1/2", "1/1 - 1s - loss: 0.9000 - accuracy: 0.5 - val_loss: 0.8000 - val_accuracy: 0.6",
+          "Epoch 2/2", "1/1 - 1s - loss: 0.7000 - accuracy: 0.6 - val_loss: nan - val_accuracy: 0.6")
+
+
+def test_curve_and_nan_rule():
+    monitor = TrainingMonitor(1, LogClient([page(*EPOCHS[:2]), page(*EPOCHS)]), merge_rules({}))
+    assert monitor.update() is None
+    assert monitor.update() == "val_loss not finite in epoch 2"
+    assert [point["epoch"] for point in monitor.curve] == [1, 2]
+
+
+def test_malformed_log_does_not_raise():
+    pages = [
+        {"success": True, "stdout": [{"data": EPOCHS[0]}], "totalCount": "many"},
+        {"success": True, "stdout": [{"data": None}, {"data": 3}], "totalCount": 2},
+        {"success": True, "stdout": "not a list", "totalCount": 5},
+        page(*EPOCHS[:2], total=4),
+    ]
+    monitor = TrainingMonitor(1, LogClient(pages), merge_rules({}))
+    for _ in range(3):
+        assert monitor.update() is None
+    # Polling goes on, and the next good page is read.
+    assert monitor.update() is None
+    assert monitor.curve[-1]["val_loss"] == 0.8
@@ -0,0 +1,81 @@
+import multiprocessing
+import time
+from utils.work_queue import DONE, LEASED, PENDING, WorkQueue
+
+CONFIG = {"name": "exp", "models": {"96": ["transfer_mobilenetv2_a35"]}}
+TASKS = 40
+WORKERS = 4
+
+
+def work(path, worker, claimed):
+    """A worker process: claim tasks until none are left and complete them."""
+    queue = WorkQueue(path)
+    while True:
+        task = queue.claim("exp", worker)
+        if task is None:
+            break
+        claimed.put((worker, task["id"]))
+        time.sleep(0.005)
+        assert queue.complete(task, worker, {task["id"]: 1.0})
+    queue.close()
+
+
+def claim_once(path, worker, lease, claimed):
+    """A worker process that claims one task and dies without completing it."""
+    queue = WorkQueue(path)
+    task = queue.claim("exp", worker, lease=lease)
+    claimed.put((worker, task and task["id"]))
+    queue.close()
+
+
+def run(processes):
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def drain(claimed, n):
+    return [claimed.get(timeout=10) for _ in range(n)]
+
+
+def test_every_task_is_leased_once(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = WorkQueue(path)
+    queue.enqueue(CONFIG, [(f"select:{i}", 0) for i in range(TASKS)])
+
+    # Separate processes, like workers on different machines, with nothing in common but the file.
+    ctx = multiprocessing.get_context("spawn")
+    claimed = ctx.Queue()
+    run([ctx.Process(target=work, args=(path, f"w{i}", claimed)) for i in range(WORKERS)])
+
+    ids = [task_id for _, task_id in drain(claimed, TASKS)]
+    assert sorted(ids) == sorted(f"select:{i}" for i in range(TASKS))
+    assert claimed.empty()
+    tasks = queue.tasks("exp")
+    assert all(task["status"] == DONE and task["attempts"] == 1 for task in tasks)
+    assert queue.counts("exp")[DONE] == TASKS
+
+
+def test_expired_lease_is_reclaimed_once(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = WorkQueue(path)
+    queue.enqueue(CONFIG, [("select:0", 0)])
+    ctx = multiprocessing.get_context("spawn")
+    claimed = ctx.Queue()
+
+    run([ctx.Process(target=claim_once, args=(path, "dead", 0.5, claimed))])
+    assert drain(claimed, 1) == [("dead", "select:0")]
+    # While the lease holds, nobody else gets the task.
+    run([ctx.Process(target=claim_once, args=(path, "early", 60, claimed))])
+    assert drain(claimed, 1) == [("early", None)]
+    assert queue.counts("exp")[LEASED] == 1
+
+    time.sleep(0.6)
+    assert queue.counts("exp")[PENDING] == 1
+    run([ctx.Process(target=claim_once, args=(path, f"w{i}", 60, claimed)) for i in range(WORKERS)])
+    winners = [worker for worker, task_id in drain(claimed, WORKERS) if task_id is not None]
+    assert len(winners) == 1
+    task = queue.tasks("exp")[0]
+    assert task["worker"] == winners[0] and task["attempts"] == 2
@@ -0,0 +1,97 @@
+"""
+Predict how long experiment stages take, from the durations in the experiment journal.
+
+Every stage the pipeline runs is recorded with its model type, image size and
+number of samples (see Journal.record_duration). For every (stage, model type,
+img_size) a straight line seconds = a + b * samples is fitted on that history.
+Keys without enough history fall back to a coarser one (any model, then any
+image size) and finally to EXPECTED_DURATION in job_status.py.
+
+The estimates also give every job a time budget (timeout), after which it is
+cancelled as stuck, but only if that exact (stage, model type, img_size) has
+history: a coarser fallback says little about a bigger model or image size.
+A job cancelled for its budget is recorded with the time it ran, so the next
+budget for that key grows instead of cancelling every retry at the same point.
+
+Usage:
+python -m utils.duration_model      # show the fitted models
+"""
+import argparse
+from utils.experiment_journal import JOURNAL_PATH, Journal
+from utils.job_status import EXPECTED_DURATION
+
+# Stages that are not jobs on the server, in seconds per sample.
+LOCAL_STAGE_DEFAULTS = {"upload": 0.2, "select": 0.01}
+# A job may take this many times its estimate, but at least MIN_TIMEOUT seconds.
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 600
+
+
+def fit_line(points):
+    """Least squares (a, b) of seconds = a + b * samples, a constant if samples don't vary."""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x == 0:
+        return mean_y, 0.0
+    b = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    b = max(b, 0.0)  # More samples never make a stage faster.
+    return mean_y - b * mean_x, b
+
+
+def fit(durations):
+    """
+    Fit the duration models on recorded durations (Journal.durations()).
+    Returns {(stage, model_type, img_size): (a, b)}, with None for "any".
+    """
+    groups = {}
+    for d in durations:
+        samples = d["samples"] or 0
+        for key in ((d["stage"], d["model_type"], d["img_size"]),
+                    (d["stage"], None, d["img_size"]),
+                    (d["stage"], None, None)):
+            groups.setdefault(key, []).append((samples, d["seconds"]))
+    return {key: fit_line(points) for key, points in groups.items()}
+
+
+def estimate(models, stage, model_type="", img_size=None, samples=0):
+    """Predicted duration of a stage in seconds."""
+    for key in ((stage, model_type or "", img_size), (stage, None, img_size), (stage, None, None)):
+        if key in models:
+            a, b = models[key]
+            return max(a + b * (samples or 0), 0.0)
+    if stage in LOCAL_STAGE_DEFAULTS:
+        return LOCAL_STAGE_DEFAULTS[stage] * (samples or 0)
+    return EXPECTED_DURATION.get(stage, 0)
+
+
+def timeout(models, stage, model_type="", img_size=None, samples=0, timeouts=None):
+    """
+    Seconds a job of a stage may run before it is cancelled, None for no timeout at all.
+    timeouts: configured {stage: seconds} that win over the estimate.
+    Without history for exactly this stage, model type and img_size there is no timeout.
+    """
+    if timeouts and stage in timeouts:
+        return timeouts[stage]
+    if (stage, model_type or "", img_size) not in models:
+        return None
+    return max(MIN_TIMEOUT, TIMEOUT_FACTOR * estimate(models, stage, model_type, img_size, samples))
+
+
+def load_models(journal=None):
+    """Fit the duration models on everything in the journal."""
+    return fit((journal or Journal()).durations())
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Show the stage duration models.")
+    parser.add_argument("--path", type=str, default=JOURNAL_PATH)
+    args = parser.parse_args()
+
+    journal = Journal(args.path)
+    print(f"{len(journal.durations())} recorded durations.")
+    for (stage, model_type, img_size), (a, b) in sorted(fit(journal.durations()).items(), key=str):
+        model_type = "*" if model_type is None else model_type or "-"
+        print(f"{stage:9} {model_type:32} {img_size or '*':>4}: {a:8.1f} s + {b:.3f} s/sample")
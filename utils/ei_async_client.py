@@ -0,0 +1,104 @@
+"""
+asyncio layer on top of the Edge Impulse helpers in utils/.
+
+Calls that do not depend on each other (allocating block IDs, polling several
+jobs, fetching results, uploads) can be awaited together, while a semaphore
+keeps at most max_concurrency requests in flight. Each call runs the regular
+synchronous helper in a worker thread over the shared pooled EIClient, so the
+synchronous functions stay the single implementation of every endpoint and the
+existing scripts keep working unchanged.
+
+Example:
+    async def main():
+        ei = AsyncEIClient(max_concurrency=4)
+        ids = await ei.new_block_ids(3)
+        statuses = await ei.job_statuses([123, 456])
+    asyncio.run(main())
+"""
+import asyncio
+from utils.ei_client import get_client
+from utils.ei_delete_all_data import delete_all_data
+from utils.ei_folder_upload import upload_file
+from utils.ei_generate_features import generate_features
+from utils.ei_new_block_id import new_block_id
+from utils.ei_test_model import test_model
+from utils.ei_test_results import test_results
+from utils.ei_train import train_model
+from utils.job_status import check_job_status
+
+MAX_CONCURRENCY = 8
+
+
+class AsyncEIClient:
+    """
+    Async access to one Edge Impulse project with bounded concurrency.
+
+    client:          EIClient to send the requests with, defaults to the shared one.
+    max_concurrency: Max number of requests in flight at the same time.
+    """
+
+    def __init__(self, client=None, max_concurrency=MAX_CONCURRENCY):
+        self.client = client or get_client()
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        if self.client.pool_size < max_concurrency:
+            self.client.set_pool_size(max_concurrency)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a synchronous helper from utils/ with this client, in a worker thread."""
+        kwargs.setdefault("client", self.client)
+        async with self.semaphore:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+
+    async def call(self, method, path, action, **kwargs):
+        """Async version of EIClient.call for endpoints without a helper."""
+        async with self.semaphore:
+            return await asyncio.to_thread(self.client.call, method, path, action, **kwargs)
+
+    async def gather(self, *aws):
+        return await asyncio.gather(*aws)
+
+    # Impulse
+    async def get_impulse(self):
+        data = await self.call("GET", "impulse", "get impulse")
+        return data.get("impulse") if data else None
+
+    async def new_block_id(self):
+        return await self.run(new_block_id)
+
+    async def new_block_ids(self, n):
+        return await self.gather(*(self.new_block_id() for _ in range(n)))
+
+    # Jobs
+    async def generate_features(self, dsp_id):
+        return await self.run(generate_features, dsp_id)
+
+    async def train_model(self, learn_block_id, model_type):
+        return await self.run(train_model, learn_block_id, model_type)
+
+    async def test_model(self):
+        return await self.run(test_model)
+
+    async def job_status(self, job_id):
+        return await self.run(check_job_status, job_id, verbose=False)
+
+    async def job_statuses(self, job_ids):
+        """Status of several jobs at once, as a dict job_id -> status."""
+        statuses = await self.gather(*(self.job_status(job_id) for job_id in job_ids))
+        return dict(zip(job_ids, statuses))
+
+    # Classify
+    async def test_results(self, json_file):
+        return await self.run(test_results, json_file)
+
+    # Raw data
+    async def delete_all_data(self):
+        return await self.run(delete_all_data)
+
+    async def upload_file(self, path, category="training", label=None, metadata=None):
+        return await self.run(upload_file, path, category, label=label, metadata=metadata)
+
+
+def run(coro):
+    """Run a coroutine from synchronous code, e.g. run(ei.new_block_ids(3))."""
+    return asyncio.run(coro)
@@ -0,0 +1,118 @@
+"""
+Shared client for the Edge Impulse Studio API.
+
+Every helper in utils/ goes through one EIClient per project/API key, so all
+calls reuse the same keep-alive connection pool (no new TLS handshake for every
+status poll) and the same auth headers and error handling. Its requests are
+retried and rate limited by a Transport, see ei_transport.py.
+https://docs.edgeimpulse.com/reference/edge-impulse-api
+"""
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv  # type: ignore
+from utils.ei_metrics import METRICS
+from utils.ei_transport import Transport
+load_dotenv()
+
+API_KEY = os.getenv("EI_API_KEY")
+PROJECT_ID = os.getenv("EI_PROJECT_ID")
+
+BASE_URL = "https://studio.edgeimpulse.com/v1/api"
+
+
+class EIClient:
+    """
+    Pooled connection to the Edge Impulse API for a single project.
+
+    api_key:    API key of the project, defaults to EI_API_KEY from .env.
+    project_id: ID of the project, defaults to EI_PROJECT_ID from .env.
+    pool_size:  Max number of keep-alive connections kept open to the server,
+                and of requests in flight.
+    """
+
+    def __init__(self, api_key=None, project_id=None, pool_size=10):
+        self.api_key = api_key or API_KEY
+        self.project_id = project_id or PROJECT_ID
+
+        self.session = requests.Session()
+        self.session.headers.update({"x-api-key": self.api_key})
+        self.transport = Transport(self.session, pool_size)
+        METRICS.add_transport(self.project_id, self.transport)
+        self.set_pool_size(pool_size)
+
+    def set_pool_size(self, pool_size):
+        """Keep up to pool_size connections open, e.g. to match a concurrency limit."""
+        self.pool_size = pool_size
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.transport.limit.set_maximum(pool_size)
+
+    def url(self, path):
+        """Full URL for a path relative to the project, e.g. 'impulse'."""
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{BASE_URL}/{self.project_id}/{path.lstrip('/')}"
+
+    def request(self, method, path, idempotent=None, **kwargs):
+        """
+        Send a request over the pooled session and return the raw response.
+        idempotent: whether the request may be retried after an error, defaults
+                    to its method (see Transport.send).
+        """
+        return self.transport.send(method, self.url(path), idempotent, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def call(self, method, path, action, idempotent=None, **kwargs):
+        """
+        Send a request and return the parsed JSON body, or None on failure.
+        A call fails on a non-200 status or on a body with "success": false,
+        in which case a message is printed in the form
+        "❌ Failed to <action>: <status> <text>".
+        It also fails if the server could not be reached, after the retries of request.
+        """
+        try:
+            res = self.request(method, path, idempotent, **kwargs)
+        except requests.RequestException as e:
+            print(f"❌ Failed to {action}:", e)
+            return None
+        data = parse_json(res)
+        if res.status_code != 200 or data is None or not data.get("success", True):
+            print(f"❌ Failed to {action}:", res.status_code, res.text)
+            return None
+        return data
+
+    def close(self):
+        self.session.close()
+
+
+def parse_json(res):
+    """Body of the response as a dict, or None if it is not (valid) JSON."""
+    try:
+        data = res.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+_clients = {}
+
+
+def get_client(api_key=None, project_id=None):
+    """
+    Shared EIClient for the given credentials, created on first use.
+    Without arguments this is the client for the project in .env.
+    """
+    key = (api_key or API_KEY, project_id or PROJECT_ID)
+    if key not in _clients:
+        _clients[key] = EIClient(*key)
+    return _clients[key]
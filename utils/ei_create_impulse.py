@@ -97,17 +97,13 @@
 Creates an impulse. Done after adding data to the dataset.
 https://docs.edgeimpulse.com/reference/edge-impulse-api/impulse/create_impulse
 """
-import requests
-import os
-from utils.ei_new_block_id import new_block_id
-from dotenv import load_dotenv  # type: ignore
+from utils.ei_client import get_client
+from utils.ei_get_ids import cache_impulse, invalidate_impulse
+from utils.ei_new_block_id import new_block_ids
 
-load_dotenv()
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
 
-
-def create_impulse(name="MyImpulse", img_size=96, dsp_type="image", model_name="transfer_mobilenetv1_a1_d100"):
+def create_impulse(name="MyImpulse", img_size=96, dsp_type="image", model_name="transfer_mobilenetv1_a1_d100",
+                   model_names=None, client=None):
     """
     Create an impulse in Edge Impulse with specified image dimensions and DSP type.
     This is typically done after adding data to the dataset.
@@ -115,60 +111,65 @@ def create_impulse(name="MyImpulse", img_size=96, dsp_type="image", model_name="
         img_size: Width  and height of the input image.
         name: Name of the impulse. Arbitrary.
         dsp_type: Type of DSP block, either "image" or "raw".
+        model_names: Several model types, to get one learn block per model on the
+                     same DSP block, so they can be trained in parallel.
+                     Overrides model_name.
+    Returns the impulse that was created, or None if that failed.
     """
-    iB_id = new_block_id()
-    dsp_id = new_block_id()
-    lB_id = new_block_id()
-
-    res = requests.post(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/impulse",
-        headers={
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        },
-        json={
-            "name": name,
-            "inputBlocks": [
-                {
-                "id": iB_id,
-                "type": "image",
-                "name": "MyInputBlockName",  # I really don't care about these names.
-                "title": "MyInputBlockTitle",
-                "imageWidth": img_size,
-                "imageHeight": img_size,
-                "resizeMode": "squash",
-                "resizeMethod": "squash",
-                }
-            ],
-            "dspBlocks": [
-                {
-                "id": dsp_id,
-                "type": dsp_type,  # OR "raw"
-                "name": "MyDSPBlockName",
-                "axes": ["image"],
-                "input": iB_id,
-                "title": "MyDSPBlockTitle",
-                }
-            ],
-            "learnBlocks": [
-                {
-                "id": lB_id,
-                "type": "keras-transfer-image",
-                "model": model_name,  # Only used for easy identification in the json results
-                "name": "MyLearnBlockName",
-                "dsp": [dsp_id],
-                "title": "MyLearnBlockTitle",
-                }
-            ]
-
-        }
-    )
-
-    data = res.json()
-    if res.status_code == 200 and data.get('success', False):
-        print("✅ Impulse created successfully:", data)
-    else:
-        print("❌ Failed to create impulse:", res.status_code, res.text)
+    client = client or get_client()
+    model_names = model_names or [model_name]
+    block_ids = new_block_ids(2 + len(model_names), client)
+    if -1 in block_ids:
+        print("❌ Failed to create impulse: could not allocate block IDs.")
+        return None
+    iB_id, dsp_id, lB_ids = block_ids[0], block_ids[1], block_ids[2:]
+
+    impulse = {
+        "name": name,
+        "inputBlocks": [
+            {
+            "id": iB_id,
+            "type": "image",
+            "name": "MyInputBlockName",  # I really don't care about these names.
+            "title": "MyInputBlockTitle",
+            "imageWidth": img_size,
+            "imageHeight": img_size,
+            "resizeMode": "squash",
+            "resizeMethod": "squash",
+            }
+        ],
+        "dspBlocks": [
+            {
+            "id": dsp_id,
+            "type": dsp_type,  # OR "raw"
+            "name": "MyDSPBlockName",
+            "axes": ["image"],
+            "input": iB_id,
+            "title": "MyDSPBlockTitle",
+            }
+        ],
+        "learnBlocks": [
+            {
+            "id": lB_id,
+            "type": "keras-transfer-image",
+            "model": model,  # Only a label, a reused impulse keeps it, the results files have the trained model type
+            "name": f"MyLearnBlockName{i}" if i else "MyLearnBlockName",
+            "dsp": [dsp_id],
+            "title": model if len(model_names) > 1 else "MyLearnBlockTitle",
+            }
+            for i, (lB_id, model) in enumerate(zip(lB_ids, model_names))
+        ]
+    }
+
+    invalidate_impulse(client)
+    # Replaces the whole impulse, so sending it twice does no harm.
+    data = client.call("POST", "impulse", "create impulse", idempotent=True, json=impulse)
+    if data is None:
+        return None
+    print("✅ Impulse created successfully:", data)
+    # Spares get_dsp_id / learn_block_id a GET, we know exactly what we created.
+    cache_impulse(impulse, client)
+    return impulse
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+"""
+Keep several dataset variants in one project and switch between them by
+enabling/disabling samples, instead of delete_all_data() and uploading again.
+
+Every variant (dataset folder + the seed it was split with) is uploaded once,
+with its origin in the sample metadata:
+    {"dataset": "EXP1_FRONT_CHUNKED", "chunk": "chunk_3", "seed": "0", "sha256": ...}
+select_dataset then enables exactly the samples of the wanted variant (and
+chunks) and disables all others, which only takes a few batch requests.
+
+A new seed of a dataset holds the same images with another train/test split.
+Instead of uploading it as a new variant, the samples of a previous seed are
+moved between categories and re-tagged with the new seed (resplit_dataset_variant).
+
+Don't mix this with ei_dataset_sync.py on the same project: a sync deletes every
+sample that is not in the folders being synced.
+
+Usage:
+python -m utils.ei_dataset_select upload BASE/EXP1_FRONT_CHUNKED --seed 0
+python -m utils.ei_dataset_select select EXP1_FRONT_CHUNKED --seed 0 --chunks chunk_0 chunk_1
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.ei_client import get_client
+from utils.ei_dataset_sync import HASH_KEY, apply_moves, file_hash
+from utils.ei_folder_upload import UPLOAD_WORKERS, find_samples, upload_file
+from utils.ei_raw_data import CATEGORIES, disable_samples, enable_samples, list_all_samples, set_sample_metadata
+
+
+def variant_key(metadata):
+    """(dataset, seed) of a sample, from its metadata."""
+    return metadata.get("dataset"), metadata.get("seed")
+
+
+def local_variant(dataset_path):
+    """All files of the chunks of a dataset folder, as {(chunk, sha256): (path, category)}."""
+    files = {}
+    for chunk in sorted(os.listdir(dataset_path)):
+        chunk_path = os.path.join(dataset_path, chunk)
+        if os.path.isdir(chunk_path):
+            for path, category in find_samples(chunk_path):
+                files[(chunk, file_hash(path))] = (path, category)
+    return files
+
+
+def resplit_dataset_variant(dataset_path, seed, local=None, remote=None, workers=UPLOAD_WORKERS, client=None):
+    """
+    Turn the samples of another seed of this dataset into the given seed:
+    move them to the train/test split of the local folder and re-tag their seed
+    and chunk. Only sends small metadata requests, no image bytes.
+    Returns True if that worked, False if no other seed holds exactly these files.
+    """
+    client = client or get_client()
+    dataset = os.path.basename(os.path.normpath(dataset_path))
+    seed = str(seed)
+    local = local if local is not None else local_variant(dataset_path)
+    remote = remote if remote is not None else list_all_samples(client)
+    if remote is None:
+        return False
+
+    # A new seed may also shuffle files between chunks, so match on content only.
+    targets = {sha: (chunk, category) for (chunk, sha), (_, category) in local.items()}
+    by_seed = {}
+    for sample in remote:
+        metadata = sample.get("metadata") or {}
+        if metadata.get("dataset") == dataset:
+            by_seed.setdefault(metadata.get("seed"), {})[metadata.get(HASH_KEY)] = sample
+    source = next((s for s, samples in by_seed.items()
+                   if s != seed and set(samples) == set(targets) and len(targets) == len(local)), None)
+    if source is None:
+        return False
+
+    print(f"Re-splitting {dataset} from seed {source} to seed {seed}...")
+    moves = {}
+    for sha, sample in by_seed[source].items():
+        category = targets[sha][1]
+        if sample["category"] != category:
+            moves.setdefault((sample["category"], category), []).append(sample["id"])
+    if not apply_moves(moves, client):
+        return False
+
+    def retag(item):
+        sha, sample = item
+        metadata = dict(sample["metadata"], seed=seed, chunk=targets[sha][0])
+        return set_sample_metadata(sample["id"], metadata, client)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return all(pool.map(retag, by_seed[source].items()))
+
+
+def upload_dataset_variant(dataset_path, seed=0, workers=UPLOAD_WORKERS, resplit=True, client=None):
+    """
+    Upload all chunks of a dataset folder, tagged with dataset, chunk and seed.
+    Files of this variant that are already in the project are skipped, so this
+    is cheap to call at the start of every run.
+    resplit: if this seed is not in the project yet but another seed of the same
+             files is, re-split that one instead of uploading (see resplit_dataset_variant).
+    Returns True if every file is in the project.
+    """
+    client = client or get_client()
+    if client.pool_size < workers:
+        client.set_pool_size(workers)
+    dataset = os.path.basename(os.path.normpath(dataset_path))
+    seed = str(seed)
+
+    remote = list_all_samples(client)
+    if remote is None:
+        return False
+    present = {(s["metadata"].get("chunk"), s["metadata"].get(HASH_KEY))
+               for s in remote
+               if variant_key(s.get("metadata") or {}) == (dataset, seed)}
+    local = local_variant(dataset_path)
+
+    if not present and resplit and resplit_dataset_variant(dataset_path, seed, local, remote, workers, client):
+        print(f"✅ {dataset} (seed {seed}) re-split without uploading.")
+        return True
+
+    todo = []
+    for (chunk, sha), (path, category) in local.items():
+        if (chunk, sha) not in present:
+            metadata = {"dataset": dataset, "chunk": chunk, "seed": seed, HASH_KEY: sha}
+            todo.append((path, category, metadata))
+
+    print(f"Uploading {len(todo)} new files of {dataset} (seed {seed}), "
+          f"{len(present)} are already in the project.")
+
+    def upload(item):
+        path, category, metadata = item
+        # The same image can be in several variants, each variant gets its own sample.
+        return upload_file(path, category, metadata=metadata, allow_duplicates=True, client=client)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return all(pool.map(upload, todo))
+
+
+def select_dataset(dataset, seed=0, chunks=None, client=None):
+    """
+    Enable only the samples of one dataset variant, optionally only some of its chunks,
+    and disable everything else in the project.
+    Returns the number of enabled samples, or -1 on failure.
+    """
+    client = client or get_client()
+    seed = str(seed)
+    remote = list_all_samples(client)
+    if remote is None:
+        return -1
+
+    def wanted(sample):
+        metadata = sample.get("metadata") or {}
+        return (variant_key(metadata) == (dataset, seed)
+                and (chunks is None or metadata.get("chunk") in chunks))
+
+    ok = True
+    selected = 0
+    for category in CATEGORIES:
+        samples = [s for s in remote if s["category"] == category]
+        to_enable = [s["id"] for s in samples if wanted(s) and s.get("isDisabled")]
+        to_disable = [s["id"] for s in samples if not wanted(s) and not s.get("isDisabled")]
+        selected += sum(1 for s in samples if wanted(s))
+        if to_enable:
+            ok = enable_samples(to_enable, category, client) and ok
+        if to_disable:
+            ok = disable_samples(to_disable, category, client) and ok
+
+    if not ok:
+        return -1
+    print(f"✅ Selected {selected} samples of {dataset} (seed {seed}"
+          f"{', chunks ' + ', '.join(chunks) if chunks is not None else ''}).")
+    return selected
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Upload and select dataset variants in Edge Impulse.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upload_parser = subparsers.add_parser("upload", help="Upload all chunks of a dataset folder.")
+    upload_parser.add_argument("dataset_path", type=str)
+    upload_parser.add_argument("--seed", type=int, default=0)
+    select_parser = subparsers.add_parser("select", help="Enable only the samples of one dataset.")
+    select_parser.add_argument("dataset", type=str, help="Name of the dataset folder, e.g. EXP1_FRONT_CHUNKED.")
+    select_parser.add_argument("--seed", type=int, default=0)
+    select_parser.add_argument("--chunks", nargs="*", default=None)
+    args = parser.parse_args()
+
+    if args.command == "upload":
+        upload_dataset_variant(args.dataset_path, seed=args.seed)
+    else:
+        select_dataset(args.dataset, seed=args.seed, chunks=args.chunks)
@@ -0,0 +1,244 @@
+"""
+Incremental sync of local dataset folders to the Edge Impulse project.
+
+Instead of delete_all_data() followed by a full upload, sync_dataset_folders
+compares the local folders with what is in the project and only uploads new
+files and deletes samples that are no longer there. A local manifest maps the
+SHA-256 of every file to its remote sample:
+    .ei_sync/manifest_<projectId>.json
+Every sample is uploaded with its hash in the metadata (key "sha256"), so the
+manifest can be rebuilt from the project and is checked against it on every sync.
+
+Files that only moved between training/ and testing/ (a new train/test split of
+the same images, e.g. another seed) are moved between categories in the project,
+their bytes are never sent again. resplit_dataset does only that.
+
+Usage:
+python -m utils.ei_dataset_sync BASE/EXP2_FRONT_CHUNKED/chunk_0 BASE/EXP2_FRONT_CHUNKED/chunk_1
+python -m utils.ei_dataset_sync --resplit BASE/EXP2_FRONT_CHUNKED/chunk_0 BASE/EXP2_FRONT_CHUNKED/chunk_1
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils.ei_client import get_client
+from utils.ei_folder_upload import UPLOAD_WORKERS, find_samples, infer_label, upload_file
+from utils.ei_raw_data import CATEGORIES, delete_samples, list_all_samples, move_samples
+
+MANIFEST_DIR = ".ei_sync"
+HASH_KEY = "sha256"
+
+
+def file_hash(path):
+    """SHA-256 of the contents of a file."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def dataset_fingerprint(files):
+    """
+    One hash for a dataset, given its {sha256: {"category", "label"}} entries.
+    Only depends on the contents, labels and categories, not on paths or order.
+    """
+    h = hashlib.sha256()
+    for sha in sorted(files):
+        h.update(f"{sha}:{files[sha]['category']}:{files[sha]['label']}\n".encode())
+    return h.hexdigest()
+
+
+class Manifest:
+    """Local record of which file (by content hash) is which sample in the project."""
+
+    def __init__(self, project_id):
+        self.path = os.path.join(MANIFEST_DIR, f"manifest_{project_id}.json")
+        self.samples = {}  # sha256 -> {"sample_id", "category", "label"}
+        self.hashes = {}  # path -> [size, mtime, sha256], to avoid re-hashing unchanged files
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.samples = data.get("samples", {})
+            self.hashes = data.get("hashes", {})
+
+    def save(self):
+        os.makedirs(MANIFEST_DIR, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"samples": self.samples, "hashes": self.hashes}, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def hash(self, path):
+        """Hash of a local file, reusing the stored one if size and mtime did not change."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        cached = self.hashes.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+            return cached[2]
+        sha = file_hash(path)
+        self.hashes[key] = [stat.st_size, stat.st_mtime, sha]
+        return sha
+
+    def refresh(self, remote_samples):
+        """Make the manifest match the samples that are actually in the project."""
+        self.samples = {}
+        for sample in remote_samples:
+            sha = (sample.get("metadata") or {}).get(HASH_KEY)
+            if sha:
+                self.samples[sha] = {
+                    "sample_id": sample["id"],
+                    "category": sample["category"],
+                    "label": sample["label"],
+                }
+
+
+def local_files(dir_paths, manifest):
+    """All files in the folders as {sha256: {"path", "category", "label"}}."""
+    files = {}
+    for dir_path in dir_paths:
+        for path, category in find_samples(dir_path):
+            files[manifest.hash(path)] = {"path": path, "category": category, "label": infer_label(path)}
+    return files
+
+
+def folders_fingerprint(dir_paths, client=None):
+    """
+    Fingerprint of the dataset in some local folders, without touching the project.
+    Same value as sync_dataset_folders returns for these folders.
+    """
+    client = client or get_client()
+    manifest = Manifest(client.project_id)  # Only for its cached file hashes.
+    fingerprint = dataset_fingerprint(local_files(dir_paths, manifest))
+    manifest.save()
+    return fingerprint
+
+
+def category_moves(local, samples):
+    """
+    Samples that are in another category than their local file, with the same label,
+    as {(category, new_category): [sample IDs]}.
+    local: {sha256: {"category", "label"}}
+    samples: {sha256: {"sample_id", "category", "label"}}, e.g. Manifest.samples
+    """
+    moves = {}
+    for sha, entry in samples.items():
+        target = local.get(sha)
+        if target and target["label"] == entry["label"] and target["category"] != entry["category"]:
+            moves.setdefault((entry["category"], target["category"]), []).append(entry["sample_id"])
+    return moves
+
+
+def apply_moves(moves, client=None):
+    """Move samples between categories in bulk, returns True if all moves succeeded."""
+    ok = True
+    for (category, new_category), ids in moves.items():
+        print(f"Moving {len(ids)} samples from {category} to {new_category}...")
+        ok = move_samples(ids, category, new_category, client) and ok
+    return ok
+
+
+def resplit_dataset(dir_paths, client=None):
+    """
+    Apply a new local train/test split of the same files to the project,
+    by moving samples between categories. No image bytes are uploaded.
+    Returns the fingerprint of the dataset, or None if the project does not
+    hold exactly these files (use sync_dataset_folders for that).
+    """
+    client = client or get_client()
+    manifest = Manifest(client.project_id)
+    remote = list_all_samples(client)
+    if remote is None:
+        return None
+    manifest.refresh(remote)
+    local = local_files(dir_paths, manifest)
+    manifest.save()
+
+    if set(local) != set(manifest.samples):
+        print("❌ Cannot re-split: the project does not hold exactly these files, sync them first.")
+        return None
+    moves = category_moves(local, manifest.samples)
+    if not apply_moves(moves, client):
+        return None
+    print(f"✅ Dataset re-split: {sum(len(ids) for ids in moves.values())} samples moved.")
+    return dataset_fingerprint(local)
+
+
+def sync_dataset_folders(dir_paths, workers=UPLOAD_WORKERS, client=None):
+    """
+    Make the project contain exactly the files in dir_paths (e.g. all chunks so far).
+    Only new files are uploaded and only removed ones are deleted. Files that
+    only moved to the other category are moved, files with a new label are
+    deleted and uploaded again.
+    Returns the fingerprint of the synced dataset, or None if the sync failed.
+    """
+    client = client or get_client()
+    if client.pool_size < workers:
+        client.set_pool_size(workers)
+    manifest = Manifest(client.project_id)
+
+    remote = list_all_samples(client)
+    if remote is None:
+        return None
+    manifest.refresh(remote)
+
+    local = local_files(dir_paths, manifest)
+    # Remote samples without our hash in the metadata are unknown, so they go as well.
+    unknown = [s for s in remote if not (s.get("metadata") or {}).get(HASH_KEY)]
+    stale = {sha: entry for sha, entry in manifest.samples.items()
+             if sha not in local or entry["label"] != local[sha]["label"]}
+    new = {sha: entry for sha, entry in local.items() if sha not in manifest.samples or sha in stale}
+    moves = category_moves(local, manifest.samples)
+
+    print(f"Sync: {len(local)} local files, {len(manifest.samples)} known samples, "
+          f"{len(new)} to upload, {len(stale) + len(unknown)} to delete, "
+          f"{sum(len(ids) for ids in moves.values())} to move.")
+
+    ok = apply_moves(moves, client)
+    for category in CATEGORIES:
+        ids = [e["sample_id"] for e in stale.values() if e["category"] == category]
+        ids += [s["id"] for s in unknown if s["category"] == category]
+        if ids:
+            ok = delete_samples(ids, category, client) and ok
+    for sha in stale:
+        manifest.samples.pop(sha, None)
+
+    def upload(item):
+        sha, entry = item
+        return upload_file(entry["path"], entry["category"], entry["label"],
+                           metadata={HASH_KEY: sha}, client=client)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(upload, new.items()))
+    ok = all(results) and ok
+
+    # The ingestion API does not return sample IDs, look them up by hash.
+    if new:
+        remote = list_all_samples(client)
+        if remote is None:
+            return None
+        manifest.refresh(remote)
+    manifest.save()
+
+    missing = [sha for sha in local if sha not in manifest.samples]
+    if missing or not ok:
+        print(f"❌ Sync incomplete: {len(missing)} local files are not in the project.")
+        return None
+    print(f"✅ Dataset synced: {len(local)} samples.")
+    return dataset_fingerprint(local)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Sync local dataset folders to Edge Impulse.")
+    parser.add_argument("directories", nargs="+", help="Folders that together make up the dataset.")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="Number of parallel uploads.")
+    parser.add_argument("--resplit", action="store_true",
+                        help="Only move samples to the training/testing split of the folders, upload nothing.")
+    args = parser.parse_args()
+
+    if args.resplit:
+        print(resplit_dataset(args.directories))
+    else:
+        print(sync_dataset_folders(args.directories, workers=args.workers))
@@ -3,29 +3,20 @@ Deletes the default impulse from our Edge Impulse project.
 https://studio.edgeimpulse.com/v1/api/{projectId}/impulse
 """
 
-import requests
-import os
-from dotenv import load_dotenv  # type: ignore
-load_dotenv()
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
+from utils.ei_client import get_client
+from utils.ei_get_ids import invalidate_impulse
 
-def delete_impulse():
+
+def delete_impulse(client=None):
     """
     Deletes the default impulse from our Edge Impulse project.
     """
-    res = requests.delete(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/impulse",
-        headers={
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        }
-    )
+    client = client or get_client()
+    data = client.call("DELETE", "impulse", "delete impulse")
+    invalidate_impulse(client)
 
-    if res.status_code == 200:
+    if data is not None:
         print("✅ Impulse deleted successfully.")
-    else:
-        print("❌ Failed to delete impulse:", res.status_code, res.text)
 
 if __name__ == "__main__":
     delete_impulse()
\ No newline at end of file
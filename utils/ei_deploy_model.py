@@ -0,0 +1,77 @@
+"""
+Build and download the model file (.eim) of the impulse through the API,
+without the Linux runner CLI (see ei_fetch_model.py).
+
+https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/build_on_device_model
+https://studio.edgeimpulse.com/v1/api/{projectId}/jobs/build-ondevice-model?type={type}
+https://docs.edgeimpulse.com/reference/edge-impulse-api/deployment/download
+https://studio.edgeimpulse.com/v1/api/{projectId}/deployment/download?type={type}
+
+The build is a job on the server, the download only fetches its output, so the
+impulse may change again as soon as the build job is done.
+
+Usage:
+python -m utils.ei_deploy_model --modelname model.eim
+"""
+import argparse
+import os
+import requests
+from utils.ei_client import get_client
+from utils.job_status import wait_for_job_completion, SUCCESS
+
+# The .eim for the Linux runner on x86_64, like edge-impulse-linux-runner --download.
+DEPLOY_TARGET = "runner-linux-x86_64"
+# The unoptimized model, as the CLI was told to choose in ei_fetch_model.py.
+MODEL_TYPE = "float32"
+
+
+def build_model(client=None, target=DEPLOY_TARGET, model_type=MODEL_TYPE):
+    """Starts the deployment build of the impulse, returns its job ID (None on failure)."""
+    client = client or get_client()
+    data = client.call(
+        "POST", f"jobs/build-ondevice-model?type={target}", "start model build",
+        json={"engine": "tflite", "modelType": model_type}
+    )
+
+    if data is None:
+        return None
+    print("✅ Model build started:", data)
+    return data.get('id', None)
+
+
+def download_model(model_file, client=None, target=DEPLOY_TARGET, model_type=MODEL_TYPE):
+    """
+    Downloads the output of the last build job to model_file.
+    Returns model_file, or None on failure.
+    """
+    client = client or get_client()
+    tmp = model_file + ".tmp"
+    try:
+        res = client.get(f"deployment/download?type={target}&modelType={model_type}", stream=True)
+        if res.status_code != 200:
+            print("❌ Failed to download model:", res.status_code, res.text)
+            return None
+        with open(tmp, "wb") as f:
+            for chunk in res.iter_content(chunk_size=1 << 20):
+                f.write(chunk)
+    except requests.RequestException as e:
+        print("❌ Failed to download model:", e)
+        return None
+    os.chmod(tmp, 0o755)  # The .eim is an executable.
+    os.replace(tmp, model_file)
+    print(f"✅ Model saved to {model_file}")
+    return model_file
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Build and download the model file of the impulse.")
+    parser.add_argument("--modelname", type=str, default="model.eim",
+                        help="The name the model file will be downloaded as. Default is 'model.eim'.")
+    args = parser.parse_args()
+
+    job_id = build_model()
+    if job_id is None or wait_for_job_completion(job_id, "build") != SUCCESS:
+        print("Building the model failed.")
+        exit(1)
+    download_model(args.modelname)
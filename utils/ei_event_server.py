@@ -0,0 +1,178 @@
+"""
+Local stand-in for the Studio job event socket, to test job_events.py offline.
+
+Speaks just enough websocket + socket.io (EIO=3) to look like Studio to
+JobEventListener: it opens the connection, answers pings and broadcasts the
+events you emit to every connected client.
+
+Usage:
+python -m utils.ei_event_server --port 8765 --finish 123:10 --finish 124:20:fail
+
+Then point the listener at it with
+EI_SOCKET_URL="ws://127.0.0.1:8765/socket.io/?EIO=3&transport=websocket"
+--finish JOB:SECONDS[:fail] emits job-finished-JOB after SECONDS seconds.
+
+From Python:
+    server = EventServer(port=0).start()
+    server.emit("job-finished-123", {"success": True})
+"""
+import argparse
+import base64
+import hashlib
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+WS_MAGIC = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def _read_exact(rfile, n):
+    data = rfile.read(n)
+    if len(data) < n:
+        raise ConnectionError("socket closed")
+    return data
+
+
+def read_frame(rfile):
+    """Read one (masked) client frame, returns (opcode, payload)."""
+    b1, b2 = _read_exact(rfile, 2)
+    opcode = b1 & 0x0F
+    length = b2 & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", _read_exact(rfile, 2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", _read_exact(rfile, 8))[0]
+    mask = _read_exact(rfile, 4) if b2 & 0x80 else b"\0\0\0\0"
+    payload = _read_exact(rfile, length)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def text_frame(text):
+    """Unmasked server text frame."""
+    payload = text.encode()
+    if len(payload) < 126:
+        header = struct.pack(">BB", 0x81, len(payload))
+    elif len(payload) < 2 ** 16:
+        header = struct.pack(">BBH", 0x81, 126, len(payload))
+    else:
+        header = struct.pack(">BBQ", 0x81, 127, len(payload))
+    return header + payload
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        headers = {}
+        self.rfile.readline()  # GET /socket.io/?... HTTP/1.1
+        for line in iter(self.rfile.readline, b"\r\n"):
+            if not line:
+                return
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        accept = base64.b64encode(
+            hashlib.sha1((headers["sec-websocket-key"] + WS_MAGIC).encode()).digest()).decode()
+        self.wfile.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+
+        server = self.server.event_server
+        server.send(self, '0' + json.dumps({"sid": str(id(self)), "pingInterval": 25000}))
+        server.send(self, "40")
+        with server.lock:
+            server.clients.append(self)
+        try:
+            while True:
+                opcode, payload = read_frame(self.rfile)
+                if opcode == 0x8:  # close
+                    return
+                if payload == b"2":  # socket.io ping
+                    server.send(self, "3")
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with server.lock:
+                if self in server.clients:
+                    server.clients.remove(self)
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EventServer:
+    """Websocket server that broadcasts socket.io events to its clients."""
+
+    def __init__(self, host="127.0.0.1", port=8765):
+        self.clients = []
+        self.lock = threading.Lock()
+        self._server = _ThreadingServer((host, port), _Handler)
+        self._server.event_server = self
+        self.port = self._server.server_address[1]
+        self.url = f"ws://{host}:{self.port}/socket.io/?EIO=3&transport=websocket"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Close every client connection and stop accepting new ones."""
+        self._server.shutdown()
+        self._server.server_close()
+        with self.lock:
+            for client in self.clients:
+                try:
+                    client.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.clients.clear()
+
+    def send(self, client, text):
+        try:
+            client.wfile.write(text_frame(text))
+        except OSError:
+            pass
+
+    def emit(self, event, data):
+        """Broadcast a socket.io event to all connected clients."""
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            self.send(client, "42" + json.dumps([event, data]))
+
+    def finish_job(self, job_id, success=True):
+        self.emit(f"job-finished-{job_id}", {"success": success})
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the Edge Impulse job event socket.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--finish", action="append", default=[],
+                        help="JOB:SECONDS[:fail], emit job-finished-JOB after SECONDS seconds.")
+    args = parser.parse_args()
+
+    server = EventServer(port=args.port).start()
+    print(f"Job event server listening on {server.url}")
+
+    start = time.time()
+    pending = []
+    for spec in args.finish:
+        job_id, delay, *flag = spec.split(":")
+        pending.append((float(delay), int(job_id), not flag))
+    for delay, job_id, success in sorted(pending):
+        time.sleep(max(0, start + delay - time.time()))
+        server.finish_job(job_id, success)
+        print(f"Emitted job-finished-{job_id} (success={success})")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,28 +1,159 @@
 """
-Uses the Edge Impulse CLI to upload multiple images to the Edge Impulse platform.
-
-(De standaard ingestion API lukte me even niet, dus vandaar nu met de CLI)
-https://docs.edgeimpulse.com/docs/tools/edge-impulse-cli/cli-uploader
-
-# Jpg en PNG hoort gewoon te kunnen, zie:
+Uploads a folder of images to the Edge Impulse platform through the ingestion API.
 https://docs.edgeimpulse.com/reference/data-ingestion/ingestion-api
-Als je er zin in hebt kan je dit mooier maken ooit, maar het komt op hetzelfde neer,
-the edge-impulse-uploader stuurt het toch ook door naar de Ingestion API.
+
+This used to shell out to edge-impulse-uploader, which sends everything to the
+same ingestion API anyway, but buffers all its output and gives no control over
+parallelism. Here every file is streamed straight from disk in its own multipart
+body, with several uploads in flight over the pooled connection of the client.
+Labels and categories are inferred the same way the CLI does it:
+    label:    everything before the first '.' in the file name (class1.0.jpg -> class1)
+    category: the training/ or testing/ folder the file is in
+Duplicates (same content already in the project) are skipped by the server, like the CLI,
+and count as uploaded, so an upload can simply be run again after a crash.
 Tip: use dataset/train_test_split.py
 """
 
-import subprocess
-import os
 import argparse
-from dotenv import load_dotenv # type: ignore
-load_dotenv()
+import json
+import mimetypes
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+from utils.ei_client import get_client, parse_json
+
+INGESTION_URL = "https://ingestion.edgeimpulse.com/api"
+UPLOAD_WORKERS = 8
+CATEGORIES = ("training", "testing")
+SUPPORTED_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".wav", ".csv", ".cbor", ".json")
+# What the ingestion API says about a file with x-disallow-duplicates whose content is already there.
+DUPLICATE_ERROR = "already exists"
+
+
+class MultipartFile:
+    """
+    multipart/form-data body with a single file, read from disk in chunks.
+    requests streams any object with read() and a length, so the file is never
+    loaded into memory as a whole.
+    """
+
+    def __init__(self, path, field="data"):
+        self.boundary = uuid.uuid4().hex
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self._head = (
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n").encode()
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode()
+        self._file = open(path, "rb")
+        self._parts = [self._head, self._file, self._tail]
+        self._length = len(self._head) + os.path.getsize(path) + len(self._tail)
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        chunks = []
+        while self._parts and (size < 0 or size > 0):
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                chunk = part if size < 0 else part[:size]
+                if len(chunk) == len(part):
+                    self._parts.pop(0)
+                else:
+                    self._parts[0] = part[len(chunk):]
+            else:
+                chunk = part.read(size)
+                if not chunk or size < 0:
+                    self._parts.pop(0)
+            chunks.append(chunk)
+            if size > 0:
+                size -= len(chunk)
+        return b"".join(chunks)
+
+    def seek(self, offset, whence=0):
+        """Start over, to send the body again. Only seeking to the start is supported."""
+        if offset != 0 or whence != 0:
+            raise ValueError("MultipartFile can only seek to the start.")
+        self._file.seek(0)
+        self._parts = [self._head, self._file, self._tail]
+
+    def close(self):
+        self._file.close()
+
 
-API_KEY = os.getenv("EI_API_KEY")
+def infer_label(path):
+    """Label of a sample as the CLI infers it: the file name up to the first '.'."""
+    return os.path.basename(path).split(".")[0]
 
 
-def upload_dataset_folder(dir_path):
+def find_samples(dir_path):
     """
-    Uploads a folder of images to Edge Impulse using the CLI uploader.
+    All files to upload in the folder, as (path, category) tuples.
+    Files in training/ and testing/ get that category, others go to training.
+    """
+    samples = []
+    for root, _, files in os.walk(dir_path):
+        category = next((c for c in CATEGORIES if c in os.path.relpath(root, dir_path).split(os.sep)), "training")
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                samples.append((os.path.join(root, name), category))
+    return samples
+
+
+def upload_file(path, category="training", label=None, metadata=None, allow_duplicates=False, client=None):
+    """
+    Upload a single file to the given category of the project.
+    Returns True if the server accepted (or already had) the file.
+    allow_duplicates: also upload the file if the same content is already in the project.
+    """
+    client = client or get_client()
+    body = MultipartFile(path)
+    headers = {
+        "Content-Type": body.content_type,
+        "x-label": label or infer_label(path),
+    }
+    if not allow_duplicates:
+        headers["x-disallow-duplicates"] = "1"
+    if metadata:
+        headers["x-metadata"] = json.dumps({str(k): str(v) for k, v in metadata.items()})
+
+    try:
+        # Without duplicates a second upload of the same file changes nothing, so it may be retried.
+        res = client.post(f"{INGESTION_URL}/{category}/files", data=body, headers=headers,
+                          idempotent=not allow_duplicates)
+    except (requests.RequestException, OSError) as e:
+        print(f"❌ Failed to upload {path}:", e)
+        return False
+    finally:
+        body.close()
+
+    data = parse_json(res) or {}
+    if is_duplicate(data):
+        return True
+    files = data.get("files") or []
+    if res.status_code != 200 or not data.get("success", False) or not all(f.get("success", True) for f in files):
+        print(f"❌ Failed to upload {path}:", res.status_code, res.text)
+        return False
+    return True
+
+
+def is_duplicate(data):
+    """Whether an ingestion response turned a file down because its content is already in the project."""
+    errors = [data.get("error")] + [f.get("error") for f in data.get("files") or [] if not f.get("success", True)]
+    errors = [str(error) for error in errors if error]
+    return bool(errors) and all(DUPLICATE_ERROR in error.lower() for error in errors)
+
+
+def upload_dataset_folder(dir_path, workers=UPLOAD_WORKERS, client=None):
+    """
+    Uploads a folder of images to Edge Impulse with N parallel uploads.
     Expected folder structure (as can be created with dataset/train_test_split.py):
     dir_path/
     - testing/
@@ -39,28 +170,57 @@ def upload_dataset_folder(dir_path):
         - class2.9.jpg
         - class2.8.jpg
         - ...
+
+    Returns a summary dict with the number of uploaded and failed files,
+    the uploaded bytes and the time it took.
     """
 
     if not os.path.isdir(dir_path):
         print(f"Error: The directory {dir_path} does not exist or is not a directory.")
         exit(1)
 
-    command = [
-        "edge-impulse-uploader",
-        "--api-key", API_KEY,
-        # "--category", "split",  # this does not work? Do manually
-        # "--label", LABEL,  # leaving this out will infer label from the image name
-        "--directory", dir_path
-    ]
+    client = client or get_client()
+    if client.pool_size < workers:
+        client.set_pool_size(workers)
+
+    samples = find_samples(dir_path)
+    total_bytes = sum(os.path.getsize(path) for path, _ in samples)
+    print(f"Uploading {len(samples)} files ({total_bytes / 1e6:.1f} MB) from {dir_path} with {workers} workers...")
+
+    start = time.time()
+    done_bytes = 0
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(upload_file, path, category, client=client): (path, category)
+                   for path, category in samples}
+        for n, future in enumerate(as_completed(futures), start=1):
+            path, category = futures[future]
+            ok = future.result()
+            if ok:
+                done_bytes += os.path.getsize(path)
+            else:
+                failed.append(path)
+            elapsed = max(time.time() - start, 1e-6)
+            print(f"{'✅' if ok else '❌'} [{n}/{len(samples)}] {os.path.basename(path)} "
+                  f"({category}, {infer_label(path)}) | {n / elapsed:.1f} files/s, "
+                  f"{done_bytes / 1e6 / elapsed:.2f} MB/s")
+
+    elapsed = time.time() - start
+    print(f"Uploaded {len(samples) - len(failed)}/{len(samples)} files ({done_bytes / 1e6:.1f} MB) "
+          f"in {elapsed:.1f} seconds.")
+    return {
+        "uploaded": len(samples) - len(failed),
+        "failed": failed,
+        "bytes": done_bytes,
+        "seconds": elapsed,
+    }
 
-    result = subprocess.run(command, capture_output=True, text=True)
-    print("STDOUT:", result.stdout)
-    print("STDERR:", result.stderr)
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Upload images from a folder to Edge Impulse.")
     parser.add_argument("directory", type=str, help="Path to the directory containing images to upload.")
+    parser.add_argument("--workers", type=int, default=UPLOAD_WORKERS, help="Number of parallel uploads.")
     args = parser.parse_args()
 
-    upload_dataset_folder(args.directory)
+    upload_dataset_folder(args.directory, workers=args.workers)
@@ -9,41 +9,27 @@ As can be done in the Edge Impulse dashboard:
 https://studio.edgeimpulse.com/studio/712900/impulse/1/dsp/image/5
 """
 
-import requests
-import os
+from utils.ei_client import get_client
 from utils.ei_get_ids import get_dsp_id
-from dotenv import load_dotenv  # type: ignore
-load_dotenv()
+from utils.job_profiles import job_profile
 
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
 
-
-def generate_features(dsp_id):
+def generate_features(dsp_id, client=None, profile=None):
     """
     Generate features for the dataset using the Edge Impulse API.
     This is needed before training the model.
+    profile: the job profile (see job_profiles.py), decides on the feature importance and explorer.
     """
-    res = requests.post(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/jobs/generate-features",
-        headers={
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        },
-        json={
-            "dspId": dsp_id,
-            "calculateFeatureImportance": True,
-            "skipFeatureExplorer": False
-        }
+    client = client or get_client()
+    data = client.call(
+        "POST", "jobs/generate-features", "start feature generation",
+        json=dict({"dspId": dsp_id}, **job_profile(profile)["features"])
     )
 
-    data = res.json()
-    job_id = data.get('id', None)
-    if res.status_code == 200 and data.get('success', False):
-        print("✅ Feature generation started:", res.json())
-    else:
-        print("❌ Failed to start feature generation:", res.status_code, res.text)
-    return job_id
+    if data is None:
+        return None
+    print("✅ Feature generation started:", data)
+    return data.get('id', None)
 
 
 if __name__ == "__main__":
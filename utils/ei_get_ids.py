@@ -2,45 +2,66 @@
 Helper functions to find the DSP and learn block IDs from the Edge Impulse API.
 Needed for generating features and training the model, respectively.
 Used in generate_features.py and ei_train.py / auto_train_download.py.
+
+The impulse is cached per project, so both lookups cost at most one request.
+create_impulse fills the cache, create_impulse and delete_impulse invalidate it.
 """
-import requests
-import os
-from dotenv import load_dotenv # type: ignore
-load_dotenv()
+from utils.ei_client import get_client
+
+_impulse_cache = {}  # project_id -> impulse document
+
+
+def get_impulse(client=None, refresh=False):
+    """
+    The impulse of the project, from the cache or from one GET /impulse.
+    Returns None if it could not be fetched.
+    """
+    client = client or get_client()
+    if refresh or client.project_id not in _impulse_cache:
+        data = client.call("GET", "impulse", "get impulse")
+        if data is None:
+            return None
+        _impulse_cache[client.project_id] = data["impulse"]
+    return _impulse_cache[client.project_id]
+
+
+def cache_impulse(impulse, client=None):
+    """Store an impulse we already know, e.g. the one we just created."""
+    client = client or get_client()
+    _impulse_cache[client.project_id] = impulse
+
 
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
+def invalidate_impulse(client=None):
+    """Forget the cached impulse, after it was changed or deleted."""
+    client = client or get_client()
+    _impulse_cache.pop(client.project_id, None)
 
 
-def get_dsp_id():
+def get_dsp_id(client=None):
     """
     Get the dsp ID from the Edge Impulse API.
     This is needed for generating the features, after which we can train the model.
     """
-    res = requests.get(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/impulse",
-        headers={ "x-api-key": API_KEY }
-    )
+    impulse = get_impulse(client)
+    if impulse is None:
+        return -1
 
-    data = res.json()
-    for block in data["impulse"]["dspBlocks"]:
+    for block in impulse["dspBlocks"]:
         print(f"ID: {block['id']} | Type: {block['type']} | Name: {block['name']}")
         return block["id"]
     return -1  # Not found
 
 
-def learn_block_id():
+def learn_block_id(client=None):
     """
     Get the learn block ID from the Edge Impulse API.
     This is needed for training the model.
     """
-    res = requests.get(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/impulse",
-        headers={ "x-api-key": API_KEY }
-    )
+    impulse = get_impulse(client)
+    if impulse is None:
+        return -1
 
-    data = res.json()
-    for block in data["impulse"]["learnBlocks"]:
+    for block in impulse["learnBlocks"]:
         print(f"ID: {block['id']} | Type: {block['type']} | Name: {block['name']}")
         if block["type"] == "keras-transfer-image":
             return block["id"]
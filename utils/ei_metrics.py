@@ -0,0 +1,216 @@
+"""
+Metrics of the Edge Impulse API calls and jobs, to see where the time of a sweep goes.
+
+Every request of an EIClient (see ei_transport.py) is recorded by endpoint,
+method and status: its latency, the bytes sent and received and the retries.
+Numeric IDs in the path are replaced by {id}, so all status polls are one
+endpoint. The JobWatcher (job_status.py) records how long every job was waited for.
+
+While a sweep runs the metrics are served in the Prometheus text format on
+http://127.0.0.1:9464/metrics (EI_METRICS_PORT in .env, 0 turns it off), and
+a summary per endpoint is printed when the process exits:
+    ei_requests_total{method, endpoint, status}           counter
+    ei_request_seconds{method, endpoint}                  histogram
+    ei_request_bytes_total, ei_response_bytes_total       counters
+    ei_request_retries_total{method, endpoint}            counter
+    ei_job_seconds{type, status}                          histogram
+    ei_concurrency_limit, ei_requests_in_flight{project}  gauges of the AIMD limit
+https://prometheus.io/docs/instrumenting/exposition_formats/
+"""
+import atexit
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+METRICS_PORT = 9464
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+JOB_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+
+def endpoint(url):
+    """The path of a request without project and numeric IDs, e.g. jobs/{id}/status."""
+    path = re.sub(r"^/v1/api/\d+/?", "", urlparse(url).path)
+    return re.sub(r"/\d+(?=/|$)", "/{id}", path) or "/"
+
+
+class Histogram:
+    """Counts of observations per bucket (upper bounds), with their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket the q-quantile falls in (the largest bucket for +Inf)."""
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= q * self.count:
+                return bound
+        return self.buckets[-1]
+
+
+def labels(**values):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in values.items()) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and histograms of the API calls of this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # (method, endpoint, status) -> count
+        self.latency = {}  # (method, endpoint) -> Histogram
+        self.sent = {}  # (method, endpoint) -> bytes
+        self.received = {}
+        self.retries = {}  # (method, endpoint) -> count
+        self.jobs = {}  # (type, status) -> Histogram
+        self.transports = {}  # project_id -> Transport
+
+    def record_request(self, method, url, status, seconds, sent=0, received=0):
+        """One attempt of a request, status "error" if no response came back."""
+        key = (method, endpoint(url))
+        with self._lock:
+            self.requests[key + (str(status),)] = self.requests.get(key + (str(status),), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.sent[key] = self.sent.get(key, 0) + sent
+            self.received[key] = self.received.get(key, 0) + received
+
+    def record_retry(self, method, url):
+        key = (method, endpoint(url))
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def record_job(self, job_type, status, seconds):
+        with self._lock:
+            self.jobs.setdefault((job_type, str(status)), Histogram(JOB_BUCKETS)).observe(seconds)
+
+    def add_transport(self, project_id, transport):
+        """Export the concurrency limit of a client."""
+        with self._lock:
+            self.transports[str(project_id)] = transport
+
+    def render(self):
+        """All metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            lines += ["# HELP ei_requests_total Edge Impulse API requests.", "# TYPE ei_requests_total counter"]
+            for (method, path, status), n in sorted(self.requests.items()):
+                lines.append(f"ei_requests_total{labels(method=method, endpoint=path, status=status)} {n}")
+            lines += ["# HELP ei_request_seconds Latency of the Edge Impulse API requests.",
+                      "# TYPE ei_request_seconds histogram"]
+            for (method, path), hist in sorted(self.latency.items()):
+                lines += render_histogram("ei_request_seconds", hist, method=method, endpoint=path)
+            for name, values, help_text in (
+                    ("ei_request_bytes_total", self.sent, "Bytes sent in request bodies."),
+                    ("ei_response_bytes_total", self.received, "Bytes received in response bodies."),
+                    ("ei_request_retries_total", self.retries, "Requests that were sent again.")):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for (method, path), n in sorted(values.items()):
+                    lines.append(f"{name}{labels(method=method, endpoint=path)} {n}")
+            lines += ["# HELP ei_job_seconds Time jobs were waited for.", "# TYPE ei_job_seconds histogram"]
+            for (job_type, status), hist in sorted(self.jobs.items()):
+                lines += render_histogram("ei_job_seconds", hist, type=job_type, status=status)
+            lines += ["# HELP ei_concurrency_limit AIMD limit of requests in flight.",
+                      "# TYPE ei_concurrency_limit gauge"]
+            lines += [f"ei_concurrency_limit{labels(project=p)} {t.limit.limit:.2f}"
+                      for p, t in sorted(self.transports.items())]
+            lines += ["# HELP ei_requests_in_flight Requests waiting for a response.",
+                      "# TYPE ei_requests_in_flight gauge"]
+            lines += [f"ei_requests_in_flight{labels(project=p)} {t.limit.in_flight}"
+                      for p, t in sorted(self.transports.items())]
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Lines of a table per endpoint and the time waited for jobs."""
+        with self._lock:
+            if not self.latency and not self.jobs:
+                return []
+            lines = [f"{'endpoint':44} {'calls':>6} {'errors':>6} {'retries':>7} {'total s':>8} "
+                     f"{'mean s':>7} {'p95 s':>6} {'sent MB':>8} {'recv MB':>8}"]
+            by_time = sorted(self.latency.items(), key=lambda item: -item[1].sum)
+            for (method, path), hist in by_time:
+                errors = sum(n for (m, p, status), n in self.requests.items()
+                             if (m, p) == (method, path) and not status.startswith("2"))
+                lines.append(f"{method + ' ' + path:44} {hist.count:6} {errors:6} "
+                             f"{self.retries.get((method, path), 0):7} {hist.sum:8.1f} "
+                             f"{hist.sum / hist.count:7.2f} {hist.quantile(0.95):6} "
+                             f"{self.sent[(method, path)] / 1e6:8.2f} {self.received[(method, path)] / 1e6:8.2f}")
+            network = sum(hist.sum for hist in self.latency.values())
+            calls = sum(hist.count for hist in self.latency.values())
+            lines.append(f"Network: {network:.1f} seconds in {calls} requests (summed over threads).")
+            for (job_type, status), hist in sorted(self.jobs.items()):
+                lines.append(f"Jobs: {hist.count} {job_type} ({status}), waited {hist.sum:.1f} seconds, "
+                             f"{hist.sum / hist.count:.1f} on average.")
+        return lines
+
+
+def render_histogram(name, hist, **values):
+    lines = []
+    cumulative = 0
+    for bound, n in zip(hist.buckets, hist.counts):
+        cumulative += n
+        lines.append(f"{name}_bucket{labels(**values, le=bound)} {cumulative}")
+    lines.append(f"{name}_bucket{labels(**values, le='+Inf')} {hist.count}")
+    lines.append(f"{name}_sum{labels(**values)} {hist.sum:.3f}")
+    lines.append(f"{name}_count{labels(**values)} {hist.count}")
+    return lines
+
+
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if urlparse(self.path).path != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass  # Every scrape would be printed between the progress of the sweep.
+
+
+def start_exporter(port=None):
+    """Serve /metrics on localhost in the background. Returns the server, or None."""
+    port = int(port if port is not None else os.getenv("EI_METRICS_PORT", METRICS_PORT))
+    if port == 0:
+        return None
+    try:
+        server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    except OSError as e:
+        # E.g. a second worker on the same machine, it still prints its summary.
+        print(f"❗ Metrics not served on port {port}: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Metrics on http://127.0.0.1:{port}/metrics")
+    return server
+
+
+def print_summary():
+    lines = METRICS.summary()
+    if lines:
+        print("Edge Impulse API calls:")
+        for line in lines:
+            print(line)
+
+
+def install_metrics(port=None):
+    """Serve the metrics while the process runs and print a summary when it exits."""
+    start_exporter(port)
+    atexit.register(print_summary)
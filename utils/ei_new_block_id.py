@@ -7,38 +7,35 @@ https://docs.edgeimpulse.com/reference/edge-impulse-api/impulse/get_new_block_id
 https://studio.edgeimpulse.com/v1/api/{projectId}/impulse/get-new-block-id
 """
 
-import requests
-import os
-from dotenv import load_dotenv  # type: ignore
-load_dotenv()
+from concurrent.futures import ThreadPoolExecutor
+from utils.ei_client import get_client
 
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
 
-print("API_KEY:", API_KEY)
-print("PROJECT_ID:", PROJECT_ID)
-
-
-def new_block_id():
+def new_block_id(client=None):
     """
     Get a new block ID from the Edge Impulse API.
     This is needed for creating new impulses or adding blocks to existing ones.
     """
-    res = requests.post(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/impulse/get-new-block-id",
-        headers={"x-api-key": API_KEY}
-    )
-    print("Status Code:", res.status_code)
-    print("Response Text:", res.text)
-
-    data = res.json()
-    if res.status_code == 200 and data.get('success', False):
-        print("✅ New block ID retrieved:", data)
-        return data.get('blockId', -1)
-    else:
-        print("❌ Failed to retrieve new block ID:", res.status_code, res.text)
+    client = client or get_client()
+    # A retry at most wastes a block ID.
+    data = client.call("POST", "impulse/get-new-block-id", "retrieve new block ID", idempotent=True)
+    if data is None:
         return -1
 
+    print("✅ New block ID retrieved:", data.get('blockId'))
+    return data.get('blockId', -1)
+
+
+def new_block_ids(n, client=None):
+    """
+    n new block IDs, requested in parallel on the pooled connection of the client,
+    so an impulse costs one round trip instead of one per block. -1 for every ID that failed.
+    """
+    client = client or get_client()
+    with ThreadPoolExecutor(max_workers=max(1, min(n, client.pool_size))) as pool:
+        return list(pool.map(lambda _: new_block_id(client), range(n)))
+
+
 if __name__ == "__main__":
     new_block_id = new_block_id()
     print("New Block ID:", new_block_id)
@@ -0,0 +1,95 @@
+"""
+Helpers for the raw-data (samples) part of the Edge Impulse API.
+Used to sync, select and re-split datasets without uploading them again.
+
+https://docs.edgeimpulse.com/reference/edge-impulse-api/raw-data/list_samples
+https://docs.edgeimpulse.com/reference/edge-impulse-api/raw-data/remove_multiple_samples
+https://docs.edgeimpulse.com/reference/edge-impulse-api/raw-data/move_multiple_samples
+"""
+import json
+from utils.ei_client import get_client
+from utils.job_status import wait_for_job_completion, SUCCESS
+
+CATEGORIES = ("training", "testing")
+PAGE_SIZE = 1000
+BATCH_SIZE = 500  # sample IDs per batch request, keeps the URL short enough
+
+
+def list_samples(category="training", client=None):
+    """All samples in a category of the project, including disabled ones."""
+    client = client or get_client()
+    samples = []
+    while True:
+        data = client.call(
+            "GET", "raw-data", f"list {category} samples",
+            params={"category": category, "limit": PAGE_SIZE, "offset": len(samples)}
+        )
+        if data is None:
+            return None
+        samples += data.get("samples", [])
+        if not data.get("samples") or len(samples) >= data.get("totalCount", 0):
+            return samples
+
+
+def list_all_samples(client=None):
+    """Samples of all categories, or None if one of the listings failed."""
+    samples = []
+    for category in CATEGORIES:
+        part = list_samples(category, client)
+        if part is None:
+            return None
+        samples += part
+    return samples
+
+
+def batch_update(operation, sample_ids, category, action, body=None, client=None):
+    """
+    Run a raw-data/batch/<operation> request for many samples of one category.
+    Large batches may be handled by the server as a job, which we wait for.
+    Returns True if every batch succeeded.
+    """
+    client = client or get_client()
+    sample_ids = list(sample_ids)
+    ok = True
+    for i in range(0, len(sample_ids), BATCH_SIZE):
+        data = client.call(
+            "POST", f"raw-data/batch/{operation}", action, idempotent=True,
+            params={"category": category, "ids": json.dumps(sample_ids[i:i + BATCH_SIZE])},
+            json=body or {}
+        )
+        if data is None:
+            ok = False
+        elif data.get("id") is not None:
+            ok = wait_for_job_completion(data["id"], "raw-data", client) == SUCCESS and ok
+    return ok
+
+
+def delete_samples(sample_ids, category, client=None):
+    """Delete the given samples of a category."""
+    return batch_update("delete", sample_ids, category, "delete samples", client=client)
+
+
+def enable_samples(sample_ids, category, client=None):
+    """Enable the given samples of a category, so they are used for training/testing again."""
+    return batch_update("enable", sample_ids, category, "enable samples", client=client)
+
+
+def disable_samples(sample_ids, category, client=None):
+    """Disable the given samples of a category, they stay in the project but are not used."""
+    return batch_update("disable", sample_ids, category, "disable samples", client=client)
+
+
+def move_samples(sample_ids, category, new_category, client=None):
+    """Move samples from one category to another (e.g. training -> testing)."""
+    return batch_update("moveSamples", sample_ids, category, f"move samples to {new_category}",
+                        body={"newCategory": new_category}, client=client)
+
+
+def set_sample_metadata(sample_id, metadata, client=None):
+    """Replace the metadata of a single sample."""
+    client = client or get_client()
+    data = client.call(
+        "POST", f"raw-data/{sample_id}/metadata", "set sample metadata", idempotent=True,
+        json={"metadata": {str(k): str(v) for k, v in metadata.items()}}
+    )
+    return data is not None
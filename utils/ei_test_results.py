@@ -3,46 +3,97 @@ Classify job results into categories based on their content.
 Can only be run if testing job has been run first.
 
 https://studio.edgeimpulse.com/v1/api/{projectId}/classify/all/result
+
+Every results file has the same keys, whether the impulse has one learn block
+or several (block_results). With one learn block it is the classify result as
+Studio returns it, with Studio's accuracyScore, like the results files of the
+first experiments. With several, Studio's accuracyScore covers all learn blocks
+of the impulse, so the file only keeps the classifications of its own block
+(classification["learnBlock"]["id"]) and an accuracy counted from those.
 """
 import json
-import os
-import requests
-from dotenv import load_dotenv  # type: ignore
-
-load_dotenv()
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
+from utils.ei_client import get_client
+from utils.ei_get_ids import learn_block_id as get_learn_block_id
 
 
-def test_results(json_file="classification_result.json"):
+def test_results(json_file="classification_result.json", client=None, learn_block_id=None):
     """
     To be run after the testing job has been run, to check the accuracy of the model.
     And to save the results to a file.
-    Saves the full JSON response to the given json_file name
-    and returns a simplified accuracy score of the classification job.
+    Saves the result of the learn block (the one of the impulse by default) to the
+    given json_file name, see block_results, and returns its accuracy (-1 on failure).
+    """
+    client = client or get_client()
+    learn_block_id = learn_block_id or get_learn_block_id(client)
+    accuracies = test_results_per_block({learn_block_id: json_file}, client)
+    return -1 if accuracies is None else accuracies[learn_block_id]
+
+def classification_block(classification):
+    """ID of the learn block a classification of a sample comes from, or None."""
+    return (classification.get("learnBlock") or {}).get("id")
+
+
+def block_results(data, learn_block_id, model_type=None):
+    """
+    The part of a classify result that belongs to one learn block, with its accuracy
+    and the model type that was trained on the block, if given.
+    If the block is the only one in the result, Studio's own document and accuracy are kept.
+    Otherwise a window counts as correct if its top label is the expected one and above
+    the minimum confidence of the block, like in the Studio.
     """
-    res = requests.get(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/classify/all/result",
-        headers={
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        }
-    )
-
-    if res.status_code == 200:
-
-        # Save the full JSON response to a file
-        data = res.json()
+    blocks = {classification_block(c) for entry in data.get("result", []) for c in entry.get("classifications", [])}
+    results = dict(data)
+    if blocks <= {learn_block_id} and (data.get("accuracy") or {}).get("accuracyScore") is not None:
+        results.update({"learnBlockId": learn_block_id, "modelType": model_type})
+        return results
+
+    samples = []
+    correct = total = 0
+    for entry in data.get("result", []):
+        classifications = [c for c in entry.get("classifications", []) if classification_block(c) == learn_block_id]
+        samples.append(dict(entry, classifications=classifications))
+        expected = (entry.get("sample") or {}).get("label")
+        for classification in classifications:
+            threshold = classification.get("minimumConfidenceRating") or 0
+            for window in classification.get("result") or []:
+                if not isinstance(window, dict) or not window:
+                    continue
+                label, score = max(window.items(), key=lambda item: item[1])
+                correct += label == expected and score >= threshold
+                total += 1
+
+    results.update({
+        "learnBlockId": learn_block_id,
+        "modelType": model_type,
+        "accuracy": {"accuracyScore": 100 * correct / total if total else -1,
+                     "correctWindows": correct, "totalWindows": total},
+        "result": samples,
+    })
+    return results
+
+
+def test_results_per_block(json_files, client=None, model_types=None):
+    """
+    Like test_results, for several learn blocks of one impulse: fetches the
+    classify result once and saves the part of every block to its own file.
+    json_files: {learn_block_id: json_file}
+    model_types: {learn_block_id: model type}, recorded in the files. The "model" of a
+                 learn block is not, it stays the first one when an impulse is reused.
+    Returns {learn_block_id: accuracy}, or None if the result could not be fetched.
+    """
+    client = client or get_client()
+    data = client.call("GET", "classify/all/result", "classify job result")
+    if data is None:
+        return None
+
+    accuracies = {}
+    for learn_block_id, json_file in json_files.items():
+        results = block_results(data, learn_block_id, (model_types or {}).get(learn_block_id))
         with open(json_file, "w") as f:
-            json.dump(data, f, indent=2)
-        print(f"✅ Classification result saved to {json_file}")
-
-        # Return the accuracy score
-        acc = data.get('accuracy', {})
-        return acc.get('accuracyScore', -1)
-    else:
-        print("❌ Failed to classify job result:", res.status_code, res.text)
-        return -1
+            json.dump(results, f, indent=2)
+        print(f"✅ Classification result of learn block {learn_block_id} saved to {json_file}")
+        accuracies[learn_block_id] = results["accuracy"]["accuracyScore"]
+    return accuracies
 
 if __name__ == "__main__":
 
@@ -3,18 +3,51 @@ Train a transfer learning model using the Edge Impulse API.
 Works for Keras models. (E.g. imagenetv2, which is our standard model in this project)
 https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/train_model_-keras
 """
-import requests
-import os
+from utils.ei_client import get_client
 from utils.ei_get_ids import learn_block_id
-from dotenv import load_dotenv # type: ignore
-load_dotenv()
+from utils.job_profiles import job_profile
 
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
+# Keys of the hyperparameters that belong to the transfer layer, not to the body.
+LAYER_KEYS = ("neurons", "dropoutRate")
 
 
+def training_payload(model_type, hyperparameters=None, profile=None):
+    """
+    The body of the Keras training job for a transfer model.
+    Everything that influences the trained model is in here, so it is also part
+    of the run cache key (see run_cache.py).
+    hyperparameters: keys of the body to override, e.g. {"trainingCycles": 30},
+                     or of the transfer layer (LAYER_KEYS), e.g. {"dropoutRate": 0.5}.
+    profile: the job profile (see job_profiles.py), decides on profileInt8.
+    """
+    # Play around with these parameters, see in Edge Impulse what standard settings are.
+    # Maybe include some of this data in report? eh idk if that's interesting enough
+    payload = {
+        "mode": "visual",
+        "trainingCycles": 20,  # 20 is standard
+        "learningRate": 0.0005,  # 0.0005 is standard
+        "batchSize": 16,
+        "trainTestSplit": 0.2,  # 20% is standard
+        "autoClassWeights": False,  # Not needed, our classes are balanced.
+        "visualLayers": [
+            {
+            "type": model_type,
+            "neurons": 0,  # no final dense layer, just the transfer model. Cam be experimented with in future works.
+            "dropoutRate": 0.1,  # Between 0 and 1. Default is 0.1.
+            }
+        ],
+    }
+    # profileInt8 costs a lot of time, only the final profile turns it on.
+    payload.update(job_profile(profile)["train"])
+    hyperparameters = dict(hyperparameters or {})
+    for key in LAYER_KEYS:
+        if key in hyperparameters:
+            payload["visualLayers"][0][key] = hyperparameters.pop(key)
+    payload.update(hyperparameters)
+    return payload
+
 
-def train_model(learn_block_id, model_type):
+def train_model(learn_block_id, model_type, client=None, hyperparameters=None, profile=None):
     """
     Train a model using the Edge Impulse API.
 
@@ -32,6 +65,8 @@ def train_model(learn_block_id, model_type):
         transfer_mobilenetv1_a25_d100
         transfer_mobilenetv1_a2_d100
         transfer_mobilenetv1_a1_d100
+    hyperparameters:    Overrides of the training parameters, see training_payload.
+    profile:            The job profile, see job_profiles.py.
 
 
     Works for Keras models. (E.g. imagenetv2, which is our standard model in this project)
@@ -41,37 +76,16 @@ def train_model(learn_block_id, model_type):
         print("Learn block ID is required for training.")
         return
 
-    res = requests.post(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/jobs/train/keras/{learn_block_id}",
-        headers={
-            "x-api-key": API_KEY,
-            "Content-Type": "application/json"
-        },
-        # Play around with these parameters, see in Edge Impulse what standard settings are.
-        # Maybe include some of this data in report? eh idk if that's interesting enough
-        json={
-            "mode": "visual",
-            "trainingCycles": 20,  # 20 is standard
-            "learningRate": 0.0005,  # 0.0005 is standard
-            "batchSize": 16,
-            "trainTestSplit": 0.2,  # 20% is standard
-            "autoClassWeights": False,  # Not needed, our classes are balanced.
-            "visualLayers": [
-                {
-                "type": model_type,
-                "neurons": 0,  # no final dense layer, just the transfer model. Cam be experimented with in future works.
-                "dropoutRate": 0.1,  # Between 0 and 1. Default is 0.1.
-                }
-            ],
-            "profileInt8": False  # Setting this to false saves a lot of time, not needed for us.
-        }
+    client = client or get_client()
+    data = client.call(
+        "POST", f"jobs/train/keras/{learn_block_id}", "start training",
+        json=training_payload(model_type, hyperparameters, profile),
     )
 
-    if res.status_code == 200:
-        print("✅ Training started:", res.json())
-    else:
-        print("❌ Failed to start training:", res.status_code, res.text)
-    return res.json()
+    if data is None:
+        return {}
+    print("✅ Training started:", data)
+    return data
 
 
 if __name__ == "__main__":
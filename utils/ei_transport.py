@@ -0,0 +1,206 @@
+"""
+Retries and client-side rate limiting for the requests of an EIClient (see ei_client.py).
+
+A multi-hour sweep makes thousands of requests, so some of them will fail for
+reasons that are gone a second later. Every request of a client goes through
+its Transport, which
+- retries failed requests with full-jitter exponential backoff: request errors
+  (connection, timeout, broken body, ...) and 5xx responses only if the request
+  is idempotent (GET, PUT, DELETE, or marked as such by the caller), 429 for
+  every request, as the server did not handle it. A Retry-After header wins over the backoff and holds back all
+  requests of the client until then;
+- keeps the request rate under RATE_LIMIT per second with a token bucket;
+- caps the requests in flight with an AIMD limit: it grows by one for every
+  window of successful requests and halves on a 429 or 503, so parallel uploads
+  and job polls settle at what the server tolerates without being throttled.
+  A request that got no response at all (DNS, reset, timeout) holds the limit:
+  a flaky connection says nothing about the load on the server.
+Every attempt is recorded in the metrics of the process, see ei_metrics.py.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from utils.ei_metrics import METRICS
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+# Statuses worth another try for an idempotent request, 429 is retried for every request.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses that mean we are sending too much.
+THROTTLE_STATUSES = (429, 503)
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_CAP = 30  # seconds
+RATE_LIMIT = 20  # requests per second
+BURST = 40
+INITIAL_CONCURRENCY = 4
+# Throttled responses within this many seconds of a decrease are the same congestion.
+DECREASE_INTERVAL = 1.0
+
+
+def backoff(attempt):
+    """Seconds to wait before retry attempt + 1: uniform between 0 and an exponential cap."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+def body_size(body):
+    """Bytes of a request body: bytes, str or a streamed body with a length."""
+    try:
+        return len(body) if body is not None else 0
+    except TypeError:
+        return 0
+
+
+def response_size(res, stream=False):
+    """Bytes of a response body, without reading a streamed one."""
+    if stream:
+        return int(res.headers.get("Content-Length") or 0)
+    return len(res.content)
+
+
+def retry_after(res):
+    """Seconds the Retry-After header of a response asks us to wait, or None."""
+    value = res.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """At most rate requests per second on average, with bursts of up to burst requests."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Send nothing for the next seconds, e.g. for a Retry-After."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class AimdLimit:
+    """Limit of requests in flight, with additive increase and multiplicative decrease."""
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, maximum=10):
+        self.maximum = maximum
+        self.limit = float(min(initial, maximum))
+        self.in_flight = 0
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, throttled=False, grow=True):
+        """Give a slot back: halve the limit if the server throttled us, else grow it (unless grow is False)."""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                if now - self._decreased > DECREASE_INTERVAL:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._decreased = now
+            elif grow:
+                # One more for every limit successful requests, i.e. per round trip of a full window.
+                self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def set_maximum(self, maximum):
+        with self._cond:
+            self.maximum = maximum
+            self.limit = min(self.limit, float(maximum))
+            self._cond.notify_all()
+
+
+class Transport:
+    """Sends the requests of one session with retries, a token bucket and an AIMD limit."""
+
+    def __init__(self, session, max_concurrency=10, rate=RATE_LIMIT, burst=BURST):
+        self.session = session
+        self.bucket = TokenBucket(rate, burst)
+        self.limit = AimdLimit(INITIAL_CONCURRENCY, max_concurrency)
+
+    def send(self, method, url, idempotent=None, **kwargs):
+        """
+        Send a request and return the response, retrying what is safe to retry.
+        idempotent: whether the request may be sent twice, defaults to its method.
+        Raises requests.RequestException if it could not be sent at all.
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt and hasattr(kwargs.get("data"), "seek"):
+                # A streamed body was (partly) read by the previous attempt.
+                kwargs["data"].seek(0)
+            if attempt:
+                METRICS.record_retry(method, url)
+            self.bucket.acquire()
+            self.limit.acquire()
+            started = time.monotonic()
+            throttled = responded = False
+            try:
+                res = self.session.request(method, url, **kwargs)
+                responded = True
+                throttled = res.status_code in THROTTLE_STATUSES
+            except requests.RequestException as e:
+                METRICS.record_request(method, url, "error", time.monotonic() - started)
+                error = e
+            else:
+                error = None
+                METRICS.record_request(method, url, res.status_code, time.monotonic() - started,
+                                       body_size(res.request.body), response_size(res, kwargs.get("stream", False)))
+            finally:
+                # Whatever went wrong, the slot is given back, or the client stalls for good.
+                # Without a response the limit is held, only the server's answers move it.
+                self.limit.release(throttled, grow=responded)
+
+            if error is not None:
+                # A connect timeout never reached the server, anything else may have.
+                if not (idempotent or isinstance(error, requests.ConnectTimeout)) or attempt == MAX_RETRIES:
+                    raise error
+                wait = backoff(attempt)
+                print(f"❗ {method} {url} failed ({type(error).__name__}), retrying in {wait:.1f} seconds...")
+                time.sleep(wait)
+                continue
+
+            retry = res.status_code == 429 or (idempotent and res.status_code in RETRY_STATUSES)
+            if not retry or attempt == MAX_RETRIES:
+                return res
+            wait = retry_after(res)
+            if wait is not None:
+                # Holds back the other requests of the client as well.
+                self.bucket.pause(wait)
+            else:
+                wait = backoff(attempt)
+            print(f"❗ {method} {url} got {res.status_code}, retrying in {wait:.1f} seconds...")
+            res.close()
+            time.sleep(wait)
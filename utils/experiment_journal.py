@@ -0,0 +1,146 @@
+"""
+Persistent journal of experiment stages, so a sweep can resume after a crash.
+
+Every stage of every run (upload, impulse, features, train, test, results) is
+stored in a small SQLite database together with the remote job ID, so that on
+restart the pipeline skips what is done and re-attaches to jobs that are still
+running on the server, instead of starting over.
+
+The same database keeps how long every stage took, for the duration model.
+
+Usage:
+python -m utils.experiment_journal                 # list all runs and their stages
+python -m utils.experiment_journal --reset RUN     # forget a run, so it is redone
+"""
+import argparse
+import json
+import sqlite3
+import threading
+import time
+
+JOURNAL_PATH = "experiments.db"
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class Journal:
+    """SQLite-backed record of (run, stage) -> status, job ID and data."""
+
+    def __init__(self, path=JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS stages (
+                run TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                status TEXT NOT NULL,
+                job_id INTEGER,
+                data TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (run, stage)
+            )""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS durations (
+                stage TEXT NOT NULL,
+                model_type TEXT NOT NULL,
+                img_size INTEGER,
+                samples INTEGER,
+                seconds REAL NOT NULL,
+                recorded REAL NOT NULL
+            )""")
+
+    def _set(self, run, stage, status, job_id=None, data=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO stages (run, stage, status, job_id, data, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run, stage, status, job_id, json.dumps(data) if data is not None else None, time.time()))
+
+    def start(self, run, stage, job_id=None, data=None):
+        """Stage started, with the remote job ID if it runs on the server."""
+        self._set(run, stage, RUNNING, job_id, data)
+
+    def finish(self, run, stage, data=None):
+        """Stage completed, data is kept for later stages or a resume."""
+        entry = self.get(run, stage)
+        job_id = entry["job_id"] if entry else None
+        self._set(run, stage, DONE, job_id, data)
+
+    def fail(self, run, stage):
+        entry = self.get(run, stage)
+        self._set(run, stage, FAILED, entry["job_id"] if entry else None, entry["data"] if entry else None)
+
+    def get(self, run, stage):
+        """The entry of a stage as a dict, or None if it never started."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, job_id, data, updated FROM stages WHERE run = ? AND stage = ?",
+                (run, stage)).fetchone()
+        if row is None:
+            return None
+        return {
+            "status": row[0],
+            "job_id": row[1],
+            "data": json.loads(row[2]) if row[2] is not None else None,
+            "updated": row[3],
+        }
+
+    def is_done(self, run, stage):
+        entry = self.get(run, stage)
+        return entry is not None and entry["status"] == DONE
+
+    def reset(self, run, stages=None):
+        """Forget some (or all) stages of a run, so they are done again."""
+        with self._lock:
+            if stages is None:
+                self._db.execute("DELETE FROM stages WHERE run = ?", (run,))
+            else:
+                self._db.executemany("DELETE FROM stages WHERE run = ? AND stage = ?",
+                                     [(run, stage) for stage in stages])
+
+    def runs(self):
+        """All runs with their stages, as {run: {stage: status}}."""
+        with self._lock:
+            rows = self._db.execute("SELECT run, stage, status FROM stages ORDER BY updated").fetchall()
+        runs = {}
+        for run, stage, status in rows:
+            runs.setdefault(run, {})[stage] = status
+        return runs
+
+    def record_duration(self, stage, seconds, model_type="", img_size=None, samples=None):
+        """How long a stage took, for the duration model (see duration_model.py)."""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO durations (stage, model_type, img_size, samples, seconds, recorded) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (stage, model_type or "", img_size, samples, seconds, time.time()))
+
+    def durations(self):
+        """All recorded durations as a list of dicts."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT stage, model_type, img_size, samples, seconds FROM durations").fetchall()
+        return [{"stage": r[0], "model_type": r[1], "img_size": r[2], "samples": r[3], "seconds": r[4]}
+                for r in rows]
+
+    def close(self):
+        self._db.close()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Show or edit the experiment journal.")
+    parser.add_argument("--path", type=str, default=JOURNAL_PATH)
+    parser.add_argument("--reset", type=str, help="Forget all stages of this run.")
+    args = parser.parse_args()
+
+    journal = Journal(args.path)
+    if args.reset:
+        journal.reset(args.reset)
+        print(f"Reset {args.reset}.")
+    for run, stages in journal.runs().items():
+        print(run, " ".join(f"{stage}={status}" for stage, status in stages.items()))
@@ -0,0 +1,571 @@
+"""
+Declarative experiment grids, compiled into a plan with as few uploads,
+selections and impulse rebuilds as possible.
+
+An experiment is a JSON config (see experiments/ in the repository root):
+{
+  "name": "exp_2",
+  "datasets": ["BASE/EXP2_FRONT_CHUNKED"],
+  "chunks": "cumulative",     # "cumulative": chunk_0, chunk_0..1, ..., "each": every chunk alone, "all": all at once
+  "min_chunks": 2,            # skip selections with fewer chunks, e.g. to have at least two classes
+  "seeds": [0, 1, 2, 3, 4],   # the run number of every cell, as the split is nondeterministic
+  "prepare": "dataset.prep_ds_exp2.create_datasets_for_exp_2",  # re-creates the folders for a seed
+  "models": {"96": ["transfer_mobilenetv2_a35"], "160": ["transfer_efficientnet_b0"]},
+  "hyperparameters": {},      # optional overrides of the training payload, see ei_train.py
+  "profile": "screening",     # optional work on the server, like downloading the models, see job_profiles.py
+  "timeouts": {"train": 3600}, # optional time budgets of the jobs in seconds, the rest is learned (duration_model.py)
+  "abort_rules": {"patience": 8}  # optional, stop a training job early (job_logs.py), default on NaN or errors only
+}
+
+plan_experiment turns the grid into a dependency graph of stages:
+    prepare(seed) -> upload(dataset, seed) -> select(dataset, seed, chunks) -> train(img_size)
+Every upload is shared by all chunks of a dataset variant (ei_dataset_select.py),
+every select by all image sizes, and every train stage is one impulse with a
+learn block per model, so features are generated once per image size
+(train_test_parallel in pipeline.py). Stages are executed seed by seed and
+dataset by dataset, with growing chunk selections, so the project only ever
+has to enable the newly added samples.
+
+run_plan executes the stages and skips every stage whose runs are all done
+(experiment journal) or in the run cache. The results are saved and the models
+downloaded and evaluated on the local test images in the background
+(post_process.py), during the next stages.
+
+With the duration model (duration_model.py) every stage gets an estimate, so a
+dry run shows how long a sweep will take. schedule reorders the chunk selections
+within a seed: longest first, or as many runs as possible before a deadline.
+
+With a pool of projects (project_pool.py) the chunk selections of a seed run in
+parallel, every selection on its own project, which gets the dataset variant
+uploaded first if it does not hold it yet. Longest-first then packs the
+selections over the projects.
+
+queue_plan puts the chunk selections in a work queue (work_queue.py) instead,
+and run_worker takes them from there, so several machines share one sweep.
+"""
+import importlib
+import json
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from utils.duration_model import estimate
+from utils.ei_client import get_client
+from utils.ei_dataset_select import select_dataset, upload_dataset_variant
+from utils.ei_dataset_sync import folders_fingerprint
+from utils.ei_folder_upload import find_samples, infer_label
+from utils.experiment_journal import Journal
+from utils.job_logs import merge_rules
+from utils.job_profiles import DEFAULT_PROFILE, job_profile
+from utils.job_status import ABORT, cancel_all_jobs
+from utils.pipeline import (cache_key, curves_file, is_run_available, is_run_done, local_results_file, model_file,
+                            results_file, train_test_parallel)
+from utils.post_process import RESULTS, TEST_DATA, PostProcessor
+from utils.project_pool import ProjectPool
+from utils.work_queue import DONE, FAILED, LEASE_SECONDS, LEASED, PENDING, Heartbeat
+
+CHUNK_POLICIES = ("cumulative", "each", "all")
+SCHEDULES = ("plan", "longest-first", "deadline")
+DEFAULTS = {
+    "chunks": "cumulative",
+    "min_chunks": 1,
+    "seeds": [0],
+    "prepare": None,
+    "hyperparameters": {},
+    "profile": DEFAULT_PROFILE,
+    "timeouts": {},
+    "abort_rules": {},
+}
+QUEUE_POLL_INTERVAL = 10  # seconds, how often an idle worker looks for tasks
+
+
+def load_config(path):
+    """Read an experiment config and fill in the defaults."""
+    with open(path) as f:
+        config = dict(DEFAULTS, **json.load(f))
+    config.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    if config["chunks"] not in CHUNK_POLICIES:
+        raise ValueError(f"Unknown chunk policy {config['chunks']}, use one of {', '.join(CHUNK_POLICIES)}.")
+    if not config.get("datasets") or not config.get("models"):
+        raise ValueError("An experiment needs at least one dataset and one model.")
+    job_profile(config["profile"])
+    # JSON keys are strings, image sizes are numbers everywhere else.
+    config["models"] = {int(size): list(dict.fromkeys(models)) for size, models in config["models"].items()}
+    return config
+
+
+def chunk_selections(chunks, policy, min_chunks=1):
+    """
+    The chunk selections of a chunked dataset as [(chunk_num, [chunks])],
+    where chunk_num is the index of the last chunk, as used in the save_names.
+    """
+    chunks = sorted(chunks)
+    if policy == "all":
+        selections = [(len(chunks) - 1, chunks)]
+    elif policy == "each":
+        selections = [(num, [chunk]) for num, chunk in enumerate(chunks)]
+    else:
+        selections = [(num, chunks[:num + 1]) for num in range(len(chunks))]
+    return [(num, selected) for num, selected in selections if len(selected) >= min_chunks]
+
+
+def save_name(dataset_name, img_size, model_type, seed, chunk_num):
+    return f"{dataset_name}_{img_size}_{model_type}_run{seed}_chunk_{chunk_num}"
+
+
+def plan_experiment(config):
+    """
+    Compile an experiment config into its stages, as a list of dicts with an "id",
+    a "kind" (prepare, upload, select or train) and the "deps" they wait for.
+    Shared stages appear once. The list is in execution order.
+    """
+    nodes = {}
+
+    def add(node):
+        # Identical stages of different cells are the same node.
+        if node["id"] not in nodes:
+            nodes[node["id"]] = node
+        return node["id"]
+
+    previous_seed = []
+    for seed_index, seed in enumerate(config["seeds"]):
+        # The folders are re-created for every seed, so a seed can only start
+        # when everything of the previous one is done.
+        prepare = add({"id": f"prepare:{seed}", "kind": "prepare", "seed": seed,
+                       "first": seed_index == 0, "deps": previous_seed})
+        seed_nodes = [prepare]
+
+        for dataset in config["datasets"]:
+            dataset_path = os.path.abspath(dataset)
+            name = os.path.basename(os.path.normpath(dataset))
+            chunks = [c for c in os.listdir(dataset_path) if os.path.isdir(os.path.join(dataset_path, c))]
+            # Sample counts as on disk now, only used for the estimates.
+            counts = {c: len(find_samples(os.path.join(dataset_path, c))) for c in chunks}
+            upload = add({"id": f"upload:{name}:{seed}", "kind": "upload", "dataset": dataset_path,
+                          "name": name, "seed": seed, "samples": sum(counts.values()), "deps": [prepare]})
+            seed_nodes.append(upload)
+
+            for chunk_num, selected in chunk_selections(chunks, config["chunks"], config["min_chunks"]):
+                select = add({"id": f"select:{name}:{seed}:{chunk_num}", "kind": "select", "dataset": dataset_path,
+                              "name": name, "seed": seed, "chunk_num": chunk_num, "chunks": selected,
+                              "samples": sum(counts[c] for c in selected), "deps": [upload]})
+                seed_nodes.append(select)
+
+                for img_size, models in sorted(config["models"].items()):
+                    if not models:
+                        continue
+                    seed_nodes.append(add({
+                        "id": f"train:{name}:{seed}:{chunk_num}:{img_size}", "kind": "train",
+                        "img_size": img_size, "models": models, "select": select, "seed": seed,
+                        "samples": sum(counts[c] for c in selected),
+                        "save_names": [save_name(name, img_size, m, seed, chunk_num) for m in models],
+                        "deps": [select],
+                    }))
+        previous_seed = seed_nodes
+
+    return execution_order(list(nodes.values()))
+
+
+def execution_order(nodes):
+    """Topological order of the stages, keeping their given order where the dependencies allow it."""
+    done = set()
+    order = []
+    waiting = list(nodes)
+    while waiting:
+        ready = [node for node in waiting if all(dep in done for dep in node["deps"])]
+        if not ready:
+            raise ValueError("The experiment plan has a dependency cycle.")
+        node = ready[0]
+        order.append(node)
+        done.add(node["id"])
+        waiting.remove(node)
+    return order
+
+
+def summarize(nodes):
+    """Number of stages of every kind, and the number of runs (trained models)."""
+    summary = {kind: 0 for kind in ("prepare", "upload", "select", "train")}
+    for node in nodes:
+        summary[node["kind"]] += 1
+    summary["runs"] = sum(len(node["save_names"]) for node in nodes if node["kind"] == "train")
+    return summary
+
+
+def estimate_plan(nodes, models, journal=None, profile=None):
+    """
+    Predicted seconds of every stage, as {node id: seconds}. Runs that are done
+    already cost nothing. The models of a train stage train in parallel, so it
+    takes as long as its slowest model plus the shared features and test, and
+    the model build if the job profile downloads the models.
+    """
+    build = estimate(models, "build") if job_profile(profile)["download"] else 0
+    estimates = {}
+    for node in nodes:
+        samples = node.get("samples")
+        if node["kind"] == "train":
+            todo = [m for m, name in zip(node["models"], node["save_names"])
+                    if journal is None or not is_run_done(journal, name)]
+            estimates[node["id"]] = 0 if not todo else (
+                estimate(models, "features", img_size=node["img_size"], samples=samples)
+                + max(estimate(models, "train", m, node["img_size"], samples) for m in todo)
+                + estimate(models, "test", img_size=node["img_size"], samples=samples)
+                + build)
+        else:
+            estimates[node["id"]] = estimate(models, node["kind"], samples=samples)
+    return estimates
+
+
+def schedule(nodes, estimates, strategy="plan", deadline=None):
+    """
+    Reorder the chunk selections of a plan, every selection with its train stages.
+    Seeds and the upload before the first selection of a dataset stay in place.
+        plan:          keep the order of the plan (least data churn).
+        longest-first: longest selections first within a seed, so a sweep that
+                       overruns only leaves short runs to do.
+        deadline:      the most runs that fit before the deadline (a timestamp),
+                       cheapest per run first. Selections that don't fit are left out.
+    Returns (nodes in their new order, save_names of the runs left out).
+    """
+    if strategy not in SCHEDULES:
+        raise ValueError(f"Unknown schedule {strategy}, use one of {', '.join(SCHEDULES)}.")
+    if strategy == "plan":
+        return nodes, []
+
+    groups = {}  # select id -> [select, train stages]
+    for node in nodes:
+        if node["kind"] == "select":
+            groups[node["id"]] = [node]
+        elif node["kind"] == "train":
+            groups[node["select"]].append(node)
+
+    def duration(group):
+        return sum(estimates[n["id"]] for n in group)
+
+    def runs(group):
+        return sum(len(n["save_names"]) for n in group if n["kind"] == "train")
+
+    left_out = set()
+    if strategy == "deadline":
+        budget = deadline - time.time()
+        budget -= sum(estimates[n["id"]] for n in nodes if n["kind"] in ("prepare", "upload"))
+        for select_id, group in sorted(groups.items(), key=lambda item: duration(item[1]) / max(runs(item[1]), 1)):
+            if duration(group) <= budget:
+                budget -= duration(group)
+            else:
+                left_out.add(select_id)
+        order_key = lambda group: duration(group) / max(runs(group), 1)
+    else:
+        order_key = lambda group: -duration(group)
+
+    ordered = []
+    for node in nodes:
+        if node["kind"] == "prepare":
+            # All selections of this seed, in the new order, each after its upload.
+            seed_groups = sorted((g for sid, g in groups.items()
+                                  if g[0]["seed"] == node["seed"] and sid not in left_out), key=order_key)
+            if seed_groups:
+                ordered.append(node)
+            uploads = {n["id"]: n for n in nodes if n["kind"] == "upload" and n["seed"] == node["seed"]}
+            for group in seed_groups:
+                upload = uploads.pop(group[0]["deps"][0], None)
+                if upload is not None:
+                    ordered.append(upload)
+                ordered.extend(group)
+    skipped = [name for sid in left_out for n in groups[sid] if n["kind"] == "train" for name in n["save_names"]]
+    return ordered, skipped
+
+
+def estimate_makespan(nodes, estimates, projects=1):
+    """
+    Predicted wall-clock seconds when the chunk selections of every seed are spread
+    over a number of projects, each selection (with its train stages) to the first
+    project that is free. A project pays for the upload of a variant once.
+    """
+    groups = []  # [prepare id, [(upload id, seconds of the selection and its trains)]]
+    for node in nodes:
+        if node["kind"] == "prepare":
+            groups.append((node["id"], []))
+        elif node["kind"] == "select":
+            groups[-1][1].append([node["deps"][0], estimates[node["id"]]])
+        elif node["kind"] == "train":
+            groups[-1][1][-1][1] += estimates[node["id"]]
+
+    total = 0.0
+    held = [set() for _ in range(projects)]
+    for prepare, selections in groups:
+        free = [0.0] * projects
+        for upload, seconds in selections:
+            project = free.index(min(free))
+            if upload not in held[project]:
+                held[project].add(upload)
+                free[project] += estimates[upload]
+            free[project] += seconds
+        total += estimates[prepare] + max(free)
+    return total
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    return f"{hours}h{rest // 60:02d}m"
+
+
+def print_plan(nodes, estimates=None, projects=1):
+    for node in nodes:
+        line = node["id"]
+        if node["kind"] == "train":
+            line += f": {len(node['models'])} models on one impulse"
+        if estimates is not None:
+            line += f" (~{format_duration(estimates[node['id']])})"
+        print(line)
+    summary = summarize(nodes)
+    print(f"{summary['runs']} runs in {summary['train']} impulses, "
+          f"{summary['upload']} uploads, {summary['select']} selections.")
+    if estimates is not None:
+        total = estimate_makespan(nodes, estimates, projects)
+        print(f"Estimated duration on {projects} project{'s' if projects > 1 else ''}: {format_duration(total)}, "
+              f"done around {time.strftime('%a %H:%M', time.localtime(time.time() + total))}.")
+
+
+def prepare_seed(node, config, journal, post=None, clients=()):
+    """
+    Re-create the dataset folders for the seed of a prepare stage, unless they hold it already.
+    post, clients: a PostProcessor whose tasks on these projects may still read the local test images.
+    """
+    # Remember which seed is on disk, so a resumed experiment does not
+    # mistake the folders of another seed for its first one.
+    on_disk = journal.get(f"{config['name']}_data", "prepare")
+    if on_disk is not None and on_disk["data"] == {"seed": node["seed"]}:
+        return
+    if (node["first"] and on_disk is None) or not config["prepare"]:
+        journal.finish(f"{config['name']}_data", "prepare", {"seed": node["seed"]})
+        return
+    if post is not None:
+        for client in clients:
+            post.barrier(client, TEST_DATA)
+    print(f"Creating datasets for {config['name']} with seed: {node['seed']}")
+    module, function = config["prepare"].rsplit(".", 1)
+    started = time.time()
+    getattr(importlib.import_module(module), function)(seed=node["seed"])
+    journal.record_duration("prepare", time.time() - started)
+    journal.finish(f"{config['name']}_data", "prepare", {"seed": node["seed"]})
+
+
+def run_group(upload, select, trains, config, journal, pool, hashes, post=None):
+    """
+    Run one chunk selection with its train stages on a project leased from the pool.
+    The dataset variant is uploaded to that project first if it does not hold it yet.
+    Returns {save_name: accuracy}, without the runs that are left to post.
+    """
+    if ABORT.is_set():
+        return {}  # Shutting down, see install_cleanup in job_status.py.
+    hyperparameters = config["hyperparameters"]
+    data_hash = hashes[select["id"]]
+    if all(is_run_available(journal, name, cache_key(model, train["img_size"], data_hash,
+                                                     hyperparameters=hyperparameters,
+                                                     profile=config["profile"])[0], config["profile"])
+           for train in trains for model, name in zip(train["models"], train["save_names"])):
+        print(f"All runs on {select['id']} are done, skipping selection...")
+        client = pool.clients[0]  # Nothing in here touches the project.
+        samples = select["samples"]
+        return run_trains(trains, config, journal, client, data_hash, samples, post, test_samples(select))
+
+    variant = (select["name"], select["seed"])
+    with pool.lease(variant) as client:
+        if post is not None:
+            # The previous runs on this project may not have fetched their classify result or
+            # evaluated their model yet. Uploading may re-split and re-tag the test set already.
+            post.barrier(client, RESULTS, TEST_DATA)
+        if not pool.has_variant(client, variant):
+            # Not skipped when journaled: another seed may have re-split these samples,
+            # and checking that the variant is complete costs only a few listings.
+            run = f"{upload['name']}_run{upload['seed']}"
+            journal.start(run, "upload")
+            started = time.time()
+            if not upload_dataset_variant(upload["dataset"], seed=upload["seed"], client=client):
+                journal.fail(run, "upload")
+                print("Uploading dataset failed. Exiting.")
+                exit(1)
+            journal.finish(run, "upload")
+            journal.record_duration("upload", time.time() - started, samples=upload["samples"])
+            pool.add_variant(client, variant)
+
+        started = time.time()
+        samples = select_dataset(select["name"], seed=select["seed"], chunks=select["chunks"], client=client)
+        if samples == -1:
+            print("Selecting dataset failed. Exiting.")
+            exit(1)
+        journal.record_duration("select", time.time() - started, samples=samples)
+        return run_trains(trains, config, journal, client, data_hash, samples, post, test_samples(select))
+
+
+def test_samples(select):
+    """The local test images of a chunk selection as [(path, label)], to evaluate the downloaded models on."""
+    return [(path, infer_label(path)) for chunk in select["chunks"]
+            for path, category in find_samples(os.path.join(select["dataset"], chunk)) if category == "testing"]
+
+
+def run_trains(trains, config, journal, client, data_hash, samples, post=None, tests=None):
+    accuracies = {}
+    for train in trains:
+        print(f"Running experiments for {train['save_names']} with image size {train['img_size']}.")
+        accuracies.update(train_test_parallel(
+            train["models"], train["save_names"], train["img_size"], journal, client,
+            data_hash, config["hyperparameters"], samples, config["profile"], config["timeouts"], post,
+            merge_rules(config["abort_rules"]), tests))
+    return accuracies
+
+
+def run_plan(nodes, config, journal=None, client=None, pool=None):
+    """
+    Execute the stages of an experiment plan in order.
+    Stages whose runs are all done or cached are skipped, so after a crash
+    this simply resumes. Returns {save_name: accuracy}.
+    pool: a ProjectPool (project_pool.py) to run the chunk selections of a seed
+          in parallel, one project each. Defaults to just the given client.
+    """
+    pool = pool or ProjectPool([client or get_client()])
+    journal = journal or Journal()
+    post = PostProcessor()
+    by_id = {node["id"]: node for node in nodes}
+    accuracies = {}
+
+    # The stages between two prepares, as (select, [train stages]) in order.
+    segments = []
+    for node in nodes:
+        if node["kind"] == "prepare":
+            segments.append((node, []))
+        elif node["kind"] == "select":
+            segments[-1][1].append((node, []))
+        elif node["kind"] == "train":
+            segments[-1][1][-1][1].append(node)
+
+    with ThreadPoolExecutor(max_workers=len(pool)) as executor:
+        for prepare, groups in segments:
+            prepare_seed(prepare, config, journal, post, pool.clients)
+            # Hashed here, while no worker is using the local folders.
+            hashes = {select["id"]: folders_fingerprint(
+                [os.path.join(select["dataset"], c) for c in select["chunks"]], pool.clients[0])
+                for select, _ in groups}
+            futures = [executor.submit(run_group, by_id[select["deps"][0]], select, trains,
+                                       config, journal, pool, hashes, post)
+                       for select, trains in groups]
+            # The next seed re-creates the folders, so everything of this one has to be done.
+            try:
+                # In the order they finish, so a failed group is seen right away.
+                for future in as_completed(futures):
+                    accuracies.update(future.result())
+            except BaseException:
+                # A failed group exits like the scripts always did, groups that did not start yet are dropped.
+                for future in futures:
+                    future.cancel()
+                # The running groups stop at their next job instead of training for hours before we exit.
+                cancel_all_jobs()
+                raise
+
+    accuracies.update(post.results())
+    post.close()
+    return accuracies
+
+
+def queue_plan(nodes, config, queue):
+    """Enqueue the chunk selections of a plan as tasks of a work queue (work_queue.py), in plan order."""
+    added = queue.enqueue(config, [(node["id"], node["seed"]) for node in nodes if node["kind"] == "select"])
+    print(f"✅ Queued {added} new tasks of {config['name']} in {queue.path}.")
+    return added
+
+
+def run_worker(queue, experiment, journal=None, pool=None, worker=None, lease=LEASE_SECONDS):
+    """
+    Take the tasks of an experiment from a work queue and run them until none are left,
+    one per project of the pool at a time. A worker only runs tasks of one seed at a time,
+    as its dataset folders hold one seed; it finishes the seed it has on disk first.
+    Results (curves, model and local evaluation) files are published next to the queue, once the
+    post-processing of a task is done. Returns {save_name: accuracy}.
+    """
+    config = queue.config(experiment)
+    if config is None:
+        print(f"❌ Experiment {experiment} is not in the queue {queue.path}.")
+        exit(1)
+    pool = pool or ProjectPool([get_client()])
+    journal = journal or Journal()
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    nodes = plan_experiment(config)
+    by_id = {node["id"]: node for node in nodes}
+    prepares = {node["seed"]: node for node in nodes if node["kind"] == "prepare"}
+    on_disk = journal.get(f"{config['name']}_data", "prepare")
+    seed = on_disk["data"]["seed"] if on_disk else None
+    post = PostProcessor()
+    accuracies = {}
+    running = {}  # future -> (task, trains)
+    finishing = []  # (task, trains, result) waiting for their post-processing
+
+    try:
+        with Heartbeat(queue, worker, lease), ThreadPoolExecutor(max_workers=len(pool)) as executor:
+            while True:
+                for task, trains, result in list(finishing):
+                    names = [name for train in trains for name in train["save_names"]]
+                    if not post.done(names):
+                        continue
+                    finishing.remove((task, trains, result))
+                    result.update(post.results(names))
+                    queue.publish([path for name in names
+                                   for path in (results_file(name), curves_file(name), model_file(name),
+                                                local_results_file(name))
+                                   if os.path.exists(path)])
+                    if queue.complete(task, worker, result):
+                        print(f"✅ Task {task['id']} done.")
+                    else:
+                        print(f"❌ Lost the lease on {task['id']}, another worker redoes it.")
+                    accuracies.update(result)
+
+                task = None
+                if len(running) < len(pool):
+                    # While tasks run on the folders of one seed, only tasks of that seed can start.
+                    task = queue.claim(experiment, worker, seed, only_seed=bool(running), lease=lease)
+                if task is not None:
+                    if task["id"] not in by_id:
+                        queue.fail(task, worker, "not in the plan of this checkout")
+                        continue
+                    if task["seed"] != seed:
+                        prepare_seed(prepares[task["seed"]], config, journal, post, pool.clients)
+                        seed = task["seed"]
+                    select = by_id[task["id"]]
+                    hashes = {select["id"]: folders_fingerprint(
+                        [os.path.join(select["dataset"], c) for c in select["chunks"]], pool.clients[0])}
+                    trains = [node for node in nodes if node["kind"] == "train" and node["select"] == select["id"]]
+                    print(f"Worker {worker} took {task['id']} (attempt {task['attempts']}).")
+                    future = executor.submit(run_group, by_id[select["deps"][0]], select, trains,
+                                             config, journal, pool, hashes, post)
+                    running[future] = (task, trains)
+                    continue
+
+                if not running and finishing:
+                    time.sleep(1)
+                    continue
+                if not running:
+                    counts = queue.counts(experiment)
+                    if not counts[PENDING] and not counts[LEASED]:
+                        break
+                    # Tasks of other workers are running, their leases may still expire.
+                    time.sleep(min(lease / 3, QUEUE_POLL_INTERVAL))
+                    continue
+
+                finished, _ = wait(running, timeout=1 if finishing else QUEUE_POLL_INTERVAL,
+                                   return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task, trains = running.pop(future)
+                    try:
+                        result = future.result()
+                    except BaseException as e:  # run_group exits on a failed stage
+                        print(f"❌ Task {task['id']} failed: {e!r}")
+                        queue.fail(task, worker, repr(e))
+                        continue
+                    finishing.append((task, trains, result))
+    finally:
+        # Tasks that did not finish, e.g. on Ctrl-C, go back to the queue right away.
+        queue.release(worker)
+
+    post.close()
+    counts = queue.counts(experiment)
+    print(f"No tasks of {experiment} left: {counts[DONE]} done, {counts[FAILED]} failed.")
+    return accuracies
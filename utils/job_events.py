@@ -0,0 +1,135 @@
+"""
+Push-based job notifications from the Edge Impulse Studio websocket.
+
+Studio publishes job output and completion on a socket.io channel per project:
+    job-data-<jobId>      {"data": "<stdout line>"}
+    job-finished-<jobId>  {"success": true/false}
+JobEventListener keeps that socket open in a background thread and reports
+finished jobs straight away, so a JobWatcher created with events=True does not
+have to wait for its next poll. If the socket drops, the watcher falls back to
+polling until the listener has reconnected.
+
+Needs the optional websocket-client package (pip install websocket-client).
+Without it, JobEventListener.start() returns False and everything keeps polling.
+
+Offline testing: run utils/ei_event_server.py and set EI_SOCKET_URL to its URL.
+
+https://docs.edgeimpulse.com/reference/edge-impulse-api/projects/get_socket_token
+"""
+import json
+import os
+import threading
+import time
+from utils.ei_client import get_client
+
+try:
+    import websocket  # type: ignore
+except ImportError:
+    websocket = None
+
+SOCKET_URL = "wss://studio.edgeimpulse.com/socket.io/?token={token}&EIO=3&transport=websocket"
+PING_INTERVAL = 25
+RECONNECT_DELAY = 5
+
+
+def get_socket_token(client=None):
+    """Short-lived token to connect to the websocket of the project."""
+    client = client or get_client()
+    data = client.call("GET", "socket-token", "get socket token")
+    if data is None:
+        return None
+    return data["token"]["socketToken"]
+
+
+class JobEventListener:
+    """
+    Background websocket connection that calls back on job events.
+
+    on_finished(job_id, success) is called for every finished job.
+    on_data(job_id, line) is called for every line of job output, if given.
+    on_disconnect() is called when an open connection drops.
+    url: socket URL to use instead of Studio, defaults to EI_SOCKET_URL if set.
+    """
+
+    def __init__(self, client=None, on_finished=None, on_data=None, on_disconnect=None, url=None):
+        self.client = client or get_client()
+        self.on_finished = on_finished
+        self.on_data = on_data
+        self.on_disconnect = on_disconnect
+        self.url = url or os.getenv("EI_SOCKET_URL")
+        self.connected = False
+        self.finished = {}  # job_id -> success, for jobs finishing before anyone waits
+        self._ws = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Connect in the background. Returns False if websockets are not available."""
+        if websocket is None:
+            print("❗️ websocket-client is not installed, falling back to polling.")
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._ws is not None:
+            self._ws.close()
+
+    def _connect(self):
+        url = self.url
+        if url is None:
+            token = get_socket_token(self.client)
+            if token is None:
+                return None
+            url = SOCKET_URL.format(token=token)
+        return websocket.create_connection(url, timeout=PING_INTERVAL)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._ws = self._connect()
+                if self._ws is not None:
+                    self._listen(self._ws)
+            except Exception as e:
+                if not self._stop.is_set():
+                    print("❗️ Job event socket error:", e)
+            finally:
+                if self.connected:
+                    self.connected = False
+                    if self.on_disconnect:
+                        self.on_disconnect()
+                if self._ws is not None:
+                    self._ws.close()
+                    self._ws = None
+            self._stop.wait(RECONNECT_DELAY)
+
+    def _listen(self, ws):
+        last_ping = time.time()
+        while not self._stop.is_set():
+            if time.time() - last_ping > PING_INTERVAL:
+                ws.send("2")  # socket.io (EIO=3) ping
+                last_ping = time.time()
+            try:
+                msg = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            if not msg:
+                return  # connection closed by the server
+            if msg.startswith("40"):
+                self.connected = True
+            elif msg.startswith("42"):
+                event, data = json.loads(msg[2:])[:2]
+                self._handle(event, data or {})
+
+    def _handle(self, event, data):
+        if event.startswith("job-finished-"):
+            job_id = int(event[len("job-finished-"):])
+            success = bool(data.get("success"))
+            self.finished[job_id] = success
+            if self.on_finished:
+                self.on_finished(job_id, success)
+        elif event.startswith("job-data-") and self.on_data:
+            self.on_data(int(event[len("job-data-"):]), data.get("data", ""))
@@ -0,0 +1,164 @@
+"""
+Follow the log of a training job while it runs, to stop it early when it is going nowhere.
+
+https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/get_logs
+https://studio.edgeimpulse.com/v1/api/{projectId}/jobs/{jobId}/stdout
+
+Keras writes a line per epoch, like
+    Epoch 3/20
+    62/62 - 4s - loss: 0.5432 - accuracy: 0.8123 - val_loss: 0.6017 - val_accuracy: 0.7900
+TrainingMonitor fetches only the new lines of the log on every poll of the
+JobWatcher (see job_status.py), parses these into a learning curve and checks the
+abort rules. When one of them fires, the watcher cancels the job. The curve
+is saved next to the results of the run either way (see pipeline.py).
+
+Abort rules, in the experiment config as "abort_rules" (null turns them off):
+    patience: stop after this many epochs without a better val_loss (loss without validation),
+              off by default, as it changes the fixed number of training cycles of the runs
+    nan:      stop as soon as a metric is NaN or infinite
+    errors:   stop on a log line that matches one of these regular expressions
+A run whose training was aborted is journaled as done, with the reason and its
+curve instead of an accuracy, so it is not trained again (see pipeline.py).
+
+Usage:
+python -m utils.job_logs JOB_ID          # print the learning curve of a job
+"""
+import argparse
+import json
+import math
+import re
+from utils.ei_client import get_client
+
+ABORT_RULES = {
+    "patience": None,
+    "nan": True,
+    "errors": [r"Traceback \(most recent call last\)", r"ResourceExhaustedError", r"[Oo]ut of memory"],
+}
+# Most lines the log is fetched with in one request.
+MAX_LOG_LINES = 1000
+
+EPOCH = re.compile(r"^\s*Epoch (\d+)/(\d+)")
+METRIC = re.compile(r"\b(val_[a-z_]+|loss|accuracy|acc)\s*:\s*([-+0-9.eE]+|nan|inf|-inf)\b", re.IGNORECASE)
+
+
+def merge_rules(overrides):
+    """The default abort rules with the configured ones on top. None turns them off."""
+    if overrides is None:
+        return None
+    return dict(ABORT_RULES, **overrides)
+
+
+def fetch_log(job_id, client=None, limit=MAX_LOG_LINES):
+    """
+    The last lines of the log of a job, oldest first, and the total number of lines.
+    Returns (None, None) if it could not be fetched.
+    """
+    client = client or get_client()
+    data = client.call("GET", f"jobs/{job_id}/stdout?limit={limit}", "get job log")
+    if data is None:
+        return None, None
+    # The API returns the newest line first.
+    lines = [entry.get("data", "") for entry in reversed(data.get("stdout", []))]
+    return lines, data.get("totalCount", len(lines))
+
+
+def parse_metrics(line):
+    """{metric: value} of a Keras epoch line, empty if the line has none."""
+    metrics = {}
+    for name, value in METRIC.findall(line):
+        metrics[name.lower()] = float(value)
+    return metrics if "loss" in metrics else {}
+
+
+class TrainingMonitor:
+    """
+    Learning curve and abort rules of one running training job.
+    job_id may be set later, once the job is started.
+    """
+
+    def __init__(self, job_id=None, client=None, rules=None):
+        self.job_id = job_id
+        self.client = client or get_client()
+        self.rules = rules
+        self.seen = 0
+        self.epoch = 0
+        self.epochs = None
+        self.curve = []  # [{"epoch": n, "loss": ..., "val_loss": ...}]
+        self.reason = None
+
+    def read(self, lines):
+        """Add log lines to the curve."""
+        for chunk in lines:
+            for line in chunk.splitlines():
+                match = EPOCH.match(line)
+                if match:
+                    self.epoch, self.epochs = int(match.group(1)), int(match.group(2))
+                    continue
+                metrics = parse_metrics(line)
+                if metrics:
+                    self.curve.append(dict(epoch=self.epoch or len(self.curve) + 1, **metrics))
+                elif self.rules and self.reason is None:
+                    for pattern in self.rules.get("errors", []):
+                        if re.search(pattern, line):
+                            self.reason = f"log line matches {pattern!r}: {line.strip()}"
+
+    def update(self, check=True):
+        """
+        Fetch the new lines of the log and check the abort rules (unless check is False,
+        e.g. for the last lines of a finished job). Returns the reason to abort the job, or None.
+        A log that can not be read is skipped, it runs on the thread that polls all jobs.
+        """
+        try:
+            lines, total = fetch_log(self.job_id, self.client)
+            if lines is None or total <= self.seen:
+                return self.reason
+            # Only the lines since the last fetch, also if the log has grown past the limit.
+            new, self.seen = lines[-(total - self.seen):], total
+            self.read(new)
+        except Exception as e:
+            print(f"❗ Reading the log of job {self.job_id} failed: {e!r}")
+            return self.reason
+        if check:
+            self.reason = self.reason or self.check()
+        return self.reason
+
+    def check(self):
+        """The abort rule that fires on the curve so far, or None."""
+        if not self.rules or not self.curve:
+            return None
+        if self.rules.get("nan"):
+            last = self.curve[-1]
+            bad = [name for name, value in last.items() if name != "epoch" and not math.isfinite(value)]
+            if bad:
+                return f"{', '.join(bad)} not finite in epoch {last['epoch']}"
+        patience = self.rules.get("patience")
+        if patience:
+            key = "val_loss" if "val_loss" in self.curve[0] else "loss"
+            losses = [point.get(key, math.inf) for point in self.curve]
+            best = losses.index(min(losses))
+            if len(losses) - 1 - best >= patience:
+                return f"no better {key} than {losses[best]:.4f} (epoch {self.curve[best]['epoch']}) " \
+                       f"in {patience} epochs"
+        return None
+
+    def save(self, path):
+        """Write the learning curve to a JSON file."""
+        with open(path, "w") as f:
+            json.dump({"job_id": self.job_id, "epochs": self.epochs, "aborted": self.reason,
+                       "curve": self.curve}, f, indent=2)
+        return path
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Print the learning curve of a training job.")
+    parser.add_argument("job_id", type=int, help="The job ID of the training job.")
+    args = parser.parse_args()
+
+    monitor = TrainingMonitor(args.job_id, rules=merge_rules({"patience": 5}))
+    reason = monitor.update()
+    for point in monitor.curve:
+        print(" ".join(f"{name}={value:.4f}" if name != "epoch" else f"epoch {value:3}"
+                       for name, value in point.items()))
+    if reason:
+        print(f"❗ Would be aborted: {reason}")
@@ -0,0 +1,53 @@
+"""
+Job profiles: which optional, expensive work the server does for a run.
+
+Feature generation can compute the feature importance and the feature explorer,
+training can profile the int8 model, and the model can be built, downloaded
+(see ei_deploy_model.py) and evaluated locally (eim_classify.py). None of it changes the trained model, it only costs
+time. A profile switches all of it at once:
+    screening: none of it, for sweeps where only the accuracy counts
+    standard:  what the run_exp scripts always did, feature importance and explorer
+    final:     everything, for the runs that end up in the report
+
+An experiment picks a profile with "profile" in its config (see experiment_plan.py),
+and the profile of every run is recorded with its results.
+
+Usage:
+python -m utils.job_profiles       # show the profiles
+"""
+import json
+
+PROFILES = {
+    "screening": {
+        # Body of the feature generation job, see ei_generate_features.py.
+        "features": {"calculateFeatureImportance": False, "skipFeatureExplorer": True},
+        # Keys of the training payload, see ei_train.py.
+        "train": {"profileInt8": False},
+        "download": False,
+    },
+    "standard": {
+        "features": {"calculateFeatureImportance": True, "skipFeatureExplorer": False},
+        "train": {"profileInt8": False},
+        "download": False,
+    },
+    "final": {
+        "features": {"calculateFeatureImportance": True, "skipFeatureExplorer": False},
+        "train": {"profileInt8": True},
+        "download": True,
+    },
+}
+DEFAULT_PROFILE = "standard"
+
+
+def job_profile(name=None):
+    """The settings of a profile by name, the default profile for None."""
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown job profile {name}, use one of {', '.join(PROFILES)}.")
+    return PROFILES[name]
+
+
+if __name__ == "__main__":
+
+    for name, settings in PROFILES.items():
+        print(f"{name}{' (default)' if name == DEFAULT_PROFILE else ''}: {json.dumps(settings)}")
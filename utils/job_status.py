@@ -1,22 +1,58 @@
 """
 Check the status of a job using the Edge Impulse API.
 https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/get_job_status
+
+JobWatcher tracks many jobs in one background loop, see wait_for_job_completion.
+With events=True it also listens for job-finished events on the Studio websocket
+(see job_events.py) and only polls as a fallback.
+https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/list_active_jobs
+
+A job can be watched with a timeout, after which it is cancelled on the server,
+and with a monitor that reads its log on every poll and can cancel it early
+(see TrainingMonitor in job_logs.py).
+install_cleanup cancels all watched jobs when the process is interrupted or
+exits, so no job keeps the compute of the project busy for nothing.
+https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/cancel_job
 """
 
-import requests
-import os
 import argparse
-from dotenv import load_dotenv # type: ignore
-load_dotenv()
-
-API_KEY = os.getenv("EI_API_KEY")
-PROJECT_ID = os.getenv("EI_PROJECT_ID")
+import atexit
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future
+import requests
+from utils.ei_client import get_client, parse_json
+from utils.ei_metrics import METRICS
+from utils.job_events import JobEventListener
 
 RUNNING = 0
 SUCCESS = 1
 FAILED = -1
+CANCELLED = -2
+STATUS_NAMES = {SUCCESS: "success", FAILED: "failed", CANCELLED: "cancelled"}
+
+# Set when the process is aborting, jobs that are started after that are cancelled right away.
+ABORT = threading.Event()
 
-def check_job_status(job_id, verbose=True):
+# Rough duration of each job type in seconds. Polls start every MIN_POLL_INTERVAL
+# seconds right after submission and back off to about a tenth of this.
+EXPECTED_DURATION = {
+    "features": 120,
+    "train": 900,
+    "test": 120,
+    "build": 180,
+    "raw-data": 30,
+}
+MIN_POLL_INTERVAL = 2
+MAX_POLL_INTERVAL = 60
+POLL_BACKOFF = 1.5
+MAX_POLL_ERRORS = 5
+# Safety-net poll interval while job events are coming in over the websocket.
+EVENTS_POLL_INTERVAL = 120
+
+def check_job_status(job_id, verbose=True, client=None):
     """
     Check the status of a job using the Edge Impulse API.
     https://docs.edgeimpulse.com/reference/edge-impulse-api/jobs/get_job_status
@@ -25,13 +61,15 @@ def check_job_status(job_id, verbose=True):
              1 if finished successfully
             -1 if failed
     """
-    res = requests.get(
-        f"https://studio.edgeimpulse.com/v1/api/{PROJECT_ID}/jobs/{job_id}/status",
-        headers={ "x-api-key": API_KEY }
-    )
+    client = client or get_client()
+    try:
+        res = client.get(f"jobs/{job_id}/status")
+    except requests.RequestException as e:
+        if verbose: print("❌ Failed to get job status:", e)
+        return None
 
-    data = res.json()
-    if res.status_code != 200:
+    data = parse_json(res)
+    if res.status_code != 200 or data is None:
         if verbose: print("❌ Failed to get job status:", res.status_code, res.text)
         return None
 
@@ -41,9 +79,7 @@ def check_job_status(job_id, verbose=True):
 
         if finished is not None:
             if finished:
-                if verbose:
-                    print("✅ Job finished successfully.")
-                    print("data", data)
+                if verbose: print("✅ Job finished successfully.")
                 return SUCCESS
             else:
                 if verbose: print("❌ Job failed.")
@@ -56,6 +92,283 @@ def check_job_status(job_id, verbose=True):
         return None
 
 
+def list_active_jobs(client=None):
+    """
+    IDs of all jobs that are still running in the project, in one request.
+    Returns None if the list could not be fetched.
+    """
+    client = client or get_client()
+    data = client.call("GET", "jobs", "list active jobs")
+    if data is None:
+        return None
+    return {job["id"] for job in data.get("jobs", [])}
+
+
+def cancel_job(job_id, client=None):
+    """Cancel a job on the server. Returns True if it was cancelled."""
+    client = client or get_client()
+    return client.call("POST", f"jobs/{job_id}/cancel", f"cancel job {job_id}", idempotent=True) is not None
+
+
+class JobWatcher:
+    """
+    Waits for many Edge Impulse jobs at once from a single background thread.
+
+    Every job is polled quickly right after submission, after which the poll
+    interval backs off to about a tenth of the expected duration of its type.
+    All jobs that are due are refreshed with one request to the active jobs
+    list, only jobs that dropped off that list get their own status request.
+
+    With events=True, jobs are resolved as soon as Studio pushes their
+    job-finished event. Polling then only runs every EVENTS_POLL_INTERVAL
+    seconds, and goes back to the adaptive intervals while the socket is down.
+
+    watcher = JobWatcher()
+    future = watcher.watch(job_id, "features", timeout=600)
+    status = future.result()  # SUCCESS / FAILED / CANCELLED, None on errors
+    """
+
+    def __init__(self, client=None, verbose=True, events=False):
+        self.client = client or get_client()
+        self.verbose = verbose
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+        self.events = None
+        if events:
+            self.events = JobEventListener(
+                self.client, on_finished=self._on_event, on_disconnect=self._on_disconnect)
+            if not self.events.start():
+                self.events = None
+
+    def watch(self, job_id, job_type="train", callback=None, timeout=None, monitor=None):
+        """
+        Start tracking a job, returns a Future that resolves to its final status.
+        callback(job_id, status) is called from the watcher thread when it completes.
+        timeout: seconds after which the job is cancelled and resolves to CANCELLED.
+        monitor: object whose update() is called on every poll of the running job and
+                 returns a reason to cancel it, or None.
+        """
+        future = Future()
+        if callback:
+            future.add_done_callback(lambda f: callback(job_id, f.result()))
+
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "type": job_type,
+                "future": future,
+                "started": now,
+                "deadline": now + timeout if timeout else None,
+                "monitor": monitor,
+                "next_poll": now + MIN_POLL_INTERVAL,
+                "interval": MIN_POLL_INTERVAL,
+                "errors": 0,
+            }
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+        if ABORT.is_set():
+            # Started while we are shutting down, it would only keep the project busy.
+            self.cancel(job_id)
+        # The job may already have finished before we started watching it.
+        elif self.events and job_id in self.events.finished:
+            self._on_event(job_id, self.events.finished[job_id])
+        return future
+
+    def wait(self, job_id, job_type="train", timeout=None, monitor=None):
+        """Block until the job is finished and return its status."""
+        return self.watch(job_id, job_type, timeout=timeout, monitor=monitor).result()
+
+    def cancel(self, job_id):
+        """Cancel a watched job on the server, its future resolves to CANCELLED."""
+        cancel_job(job_id, self.client)
+        self._resolve(job_id, CANCELLED)
+
+    def cancel_all(self):
+        """Cancel every job that is still being watched."""
+        for job_id in self.active():
+            self.cancel(job_id)
+
+    def active(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def _loop(self):
+        while True:
+            with self._lock:
+                if not self._jobs:
+                    self._thread = None
+                    return
+                next_poll = min(min(job["next_poll"], job["deadline"] or job["next_poll"])
+                                for job in self._jobs.values())
+
+            self._wakeup.wait(max(0, next_poll - time.time()))
+            self._wakeup.clear()
+            # Nothing may end this thread while jobs are watched, or their futures never resolve.
+            try:
+                self._tick()
+            except Exception as e:
+                print(f"❗ Watching jobs failed: {e!r}")
+                time.sleep(MIN_POLL_INTERVAL)
+
+    def _tick(self):
+        now = time.time()
+        with self._lock:
+            due = [job_id for job_id, job in self._jobs.items() if job["next_poll"] <= now]
+        if due:
+            self._poll(due)
+
+        with self._lock:
+            expired = [(job_id, job) for job_id, job in self._jobs.items()
+                       if job["deadline"] is not None and job["deadline"] <= now]
+        for job_id, job in expired:
+            budget = job["deadline"] - job["started"]
+            print(f"❌ Job {job_id} ({job['type']}) exceeded its budget of "
+                  f"{int(budget // 60)} minutes {round(budget % 60)} seconds, cancelling it...")
+            self.cancel(job_id)
+
+    def _poll(self, due):
+        try:
+            active = list_active_jobs(self.client)
+        except Exception as e:
+            print(f"❗ Listing the active jobs failed: {e!r}")
+            active = None
+        for job_id in due:
+            try:
+                if active is not None and job_id in active:
+                    status = RUNNING
+                else:
+                    status = check_job_status(job_id, verbose=False, client=self.client)
+                self._update(job_id, status)
+            except Exception as e:
+                print(f"❗ Polling job {job_id} failed: {e!r}")
+                self._poll_error(job_id)
+
+    def _poll_error(self, job_id):
+        """Count a poll that raised like one that got no answer: the job fails after MAX_POLL_ERRORS in a row."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job["errors"] += 1
+            job["next_poll"] = time.time() + job["interval"]
+            failed = job["errors"] >= MAX_POLL_ERRORS
+        if failed:
+            self._resolve(job_id, FAILED)
+
+    def _update(self, job_id, status):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return  # already resolved by a job event
+            monitor = job["monitor"]
+            if status is None:
+                job["errors"] += 1
+                if job["errors"] < MAX_POLL_ERRORS:
+                    status = RUNNING
+            else:
+                job["errors"] = 0
+
+            if status == RUNNING:
+                expected = EXPECTED_DURATION.get(job["type"], MAX_POLL_INTERVAL * 10)
+                max_interval = min(MAX_POLL_INTERVAL, max(MIN_POLL_INTERVAL, expected / 10))
+                job["interval"] = min(job["interval"] * POLL_BACKOFF, max_interval)
+                delay = job["interval"]
+                if self.events and self.events.connected and monitor is None:
+                    delay = EVENTS_POLL_INTERVAL
+                job["next_poll"] = time.time() + delay
+                elapsed = time.time() - job["started"]
+                if self.verbose:
+                    print(f"⌛️ Job {job_id} ({job['type']}) running for "
+                          f"{int(elapsed // 60)} minutes {round(elapsed % 60)} seconds")
+        if status != RUNNING:
+            self._resolve(job_id, status)
+        elif monitor is not None:
+            reason = monitor.update()
+            if reason:
+                print(f"❌ Stopping job {job_id} ({job['type']}): {reason}")
+                self.cancel(job_id)
+
+    def _resolve(self, job_id, status):
+        """Stop tracking a finished job and complete its future."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is None:
+            return  # already resolved by the other channel
+
+        METRICS.record_job(job["type"], STATUS_NAMES.get(status, status), time.time() - job["started"])
+        if self.verbose:
+            print(f"{'✅' if status == SUCCESS else '❌'} Job {job_id} ({job['type']}) "
+                  f"{'cancelled' if status == CANCELLED else 'finished'} "
+                  f"after {round(time.time() - job['started'])} seconds.")
+        job["future"].set_result(status)
+
+    def _on_event(self, job_id, success):
+        self._resolve(job_id, SUCCESS if success else FAILED)
+        self._wakeup.set()
+
+    def _on_disconnect(self):
+        """Socket dropped: poll every job right away and go back to adaptive polling."""
+        with self._lock:
+            for job in self._jobs.values():
+                job["next_poll"] = time.time()
+        self._wakeup.set()
+
+
+_watchers = {}
+
+
+def get_watcher(client=None, events=False):
+    """
+    Shared JobWatcher for the given client, created on first use.
+    events=True (or EI_JOB_EVENTS=1 in .env) also listens on the Studio websocket.
+    """
+    client = client or get_client()
+    if client not in _watchers:
+        events = events or os.getenv("EI_JOB_EVENTS") == "1"
+        _watchers[client] = JobWatcher(client, events=events)
+    return _watchers[client]
+
+
+def wait_for_job_completion(job_id, job_type="train", client=None, timeout=None, monitor=None):
+    """
+    Block until the job is finished and return its status.
+    job_type ("features", "train", "test") decides how fast it is polled.
+    timeout, monitor: cancel the job when it takes too long or goes wrong, see JobWatcher.watch.
+    """
+    return get_watcher(client).wait(job_id, job_type, timeout, monitor)
+
+
+def cancel_all_jobs():
+    """Cancel every job that any watcher is still waiting for, e.g. when aborting."""
+    ABORT.set()
+    for watcher in list(_watchers.values()):
+        if watcher.active():
+            print(f"Cancelling {len(watcher.active())} running jobs of project {watcher.client.project_id}...")
+            watcher.cancel_all()
+
+
+def install_cleanup():
+    """
+    Cancel the running jobs on SIGINT, SIGTERM and at exit. A second signal kills
+    the process right away. Only works from the main thread.
+    """
+    def handler(signum, frame):
+        print(f"❌ Got {signal.Signals(signum).name}, cancelling the running jobs...")
+        signal.signal(signum, signal.SIG_DFL)
+        cancel_all_jobs()
+        raise SystemExit(128 + signum)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, handler)
+    atexit.register(cancel_all_jobs)
+
+
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser(description="Check the status of a job.")
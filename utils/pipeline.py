@@ -0,0 +1,621 @@
+"""
+Automates the impulse -> features -> training -> testing -> results pipeline of
+a single experiment run. Shared by the run_exp scripts.
+
+Every stage is recorded in the experiment journal (see experiment_journal.py)
+under the save_name of the run. When a sweep is restarted after a crash, done
+stages are skipped and the pipeline re-attaches to jobs that were still running
+on the server, so no remote compute is thrown away.
+
+When the dataset_hash of a run is given, finished runs are also stored in the
+run cache (see run_cache.py), keyed on the dataset contents and the full config.
+An identical configuration is then never trained again, whatever its save_name.
+
+The generated features only depend on the input/DSP config and the dataset, not
+on the model. So when the impulse in the project was made for the same image
+size, DSP type and dataset_hash, it is kept and only its learn block is trained
+again: no delete_impulse, create_impulse or feature generation per model type.
+
+train_test_parallel goes one step further for a list of model types: one impulse
+with a learn block per model, whose training jobs all run at the same time.
+
+finish_runs saves the results after the test job and, when the job profile says so
+(see job_profiles.py), builds and downloads the model file (.eim) and evaluates it
+on the local test images of the selection (eim_classify.py). Given a PostProcessor (post_process.py) it
+runs in the background, and the next run on the project only waits for it
+before it changes the classify result or the impulse.
+
+Every job gets a time budget from the duration model (duration_model.py) or the
+configured timeouts, after which it is cancelled on the server and the run fails.
+The time of a job cancelled for its budget is recorded as well, so it grows.
+Training jobs are also followed in their log (job_logs.py): they are cancelled
+as soon as an abort rule fires, and their learning curve is saved as curves_*.json.
+An aborted run is journaled as done without accuracy, so it is skipped from then on.
+"""
+import json
+import os
+import time
+from eim_classify import evaluate_model
+from utils.duration_model import load_models, timeout
+from utils.ei_client import get_client
+from utils.ei_create_impulse import create_impulse
+from utils.ei_delete_impulse import delete_impulse
+from utils.ei_deploy_model import build_model, download_model
+from utils.ei_generate_features import generate_features
+from utils.ei_get_ids import get_dsp_id, get_impulse, learn_block_id
+from utils.ei_test_model import test_model
+from utils.ei_test_results import test_results_per_block
+from utils.ei_train import train_model, training_payload
+from utils.ei_train_efficientnet import train_efficientnet_model, efficientnet_training_payload
+from utils.experiment_journal import Journal, DONE, RUNNING
+from utils.job_logs import TrainingMonitor
+from utils.job_profiles import DEFAULT_PROFILE, job_profile
+from utils.job_status import get_watcher, wait_for_job_completion, CANCELLED, FAILED, SUCCESS
+from utils.post_process import IMPULSE, RESULTS, TEST_DATA
+from utils import run_cache
+
+STAGES = ("impulse", "features", "train", "test", "results")
+
+
+def results_file(save_name):
+    return f"results_{save_name}.json"
+
+
+def model_file(save_name):
+    return f"model_{save_name}.eim"
+
+
+def curves_file(save_name):
+    return f"curves_{save_name}.json"
+
+
+def local_results_file(save_name):
+    return f"local_results_{save_name}.json"
+
+
+def stage_timeout(journal, stage, timing=None, timeouts=None):
+    """Seconds a job of a stage may run, from the recorded durations or the configured timeouts."""
+    return timeout(load_models(journal), stage, timeouts=timeouts, **(timing or {}))
+
+
+def out_of_budget(status, seconds, budget):
+    """Whether a job was cancelled for running out of its budget, its time is a lower bound of the duration."""
+    return status == CANCELLED and budget is not None and seconds >= budget
+
+
+def run_job_stage(journal, run, stage, job_type, start_job, client=None, timing=None, timeouts=None, monitor=None):
+    """
+    Run a stage that is a job on the server, returns its final status.
+    A job that was still running when we crashed is waited for instead of restarted.
+    start_job() starts the job and returns its ID (None on failure).
+    timing: {"model_type", "img_size", "samples"} to record the duration of the
+            stage under, for the duration model (see duration_model.py).
+    timeouts: configured {stage: seconds}, see stage_timeout.
+    monitor: a TrainingMonitor (job_logs.py) to follow the job with, gets its job_id here.
+    """
+    budget = stage_timeout(journal, stage, timing, timeouts)
+    entry = journal.get(run, stage)
+    if entry and entry["status"] == DONE:
+        print(f"{stage} of {run} already done, skipping...")
+        return SUCCESS
+    if entry and entry["status"] == RUNNING and entry["job_id"] is not None:
+        print(f"Re-attaching to {stage} job {entry['job_id']} of {run}...")
+        if monitor is not None:
+            monitor.job_id = entry["job_id"]
+        if wait_for_job_completion(entry["job_id"], job_type, client, budget, monitor) == SUCCESS:
+            journal.finish(run, stage)
+            return SUCCESS
+        print(f"{stage} job {entry['job_id']} did not succeed, starting it again.")
+
+    # Anything after this stage was built on the old result.
+    journal.reset(run, STAGES[STAGES.index(stage) + 1:])
+    job_id = start_job()
+    if job_id is None:
+        journal.fail(run, stage)
+        return None
+    journal.start(run, stage, job_id)
+    started = time.time()
+    if monitor is not None:
+        monitor.job_id = job_id
+    status = wait_for_job_completion(job_id, job_type, client, budget, monitor)
+    seconds = time.time() - started
+    if timing is not None and (status == SUCCESS or out_of_budget(status, seconds, budget)):
+        journal.record_duration(stage, seconds, **timing)
+    if status == SUCCESS:
+        journal.finish(run, stage)
+    else:
+        journal.fail(run, stage)
+    return status
+
+
+def cache_key(model_type, img_size, dataset_hash, dsp_type="image", hyperparameters=None, profile=None):
+    """The run cache key and config of a run, see run_cache.py."""
+    if model_type == "transfer_efficientnet_b0":
+        payload = efficientnet_training_payload(hyperparameters, profile)
+    else:
+        payload = training_payload(model_type, hyperparameters, profile)
+    config = run_cache.run_config(dataset_hash, img_size, dsp_type, model_type, payload)
+    return run_cache.run_key(config), config
+
+
+def is_run_done(journal, save_name, key=None):
+    """
+    Whether a run has its results already, so it can be skipped as a whole.
+    key: run cache key of the run, if given the results only count if they were
+         made with that exact config (results from before the cache are trusted).
+    """
+    entry = journal.get(save_name, "results")
+    if entry is not None and entry["status"] == DONE:
+        return key is None or (entry["data"] or {}).get("key") in (None, key)
+    return os.path.exists(results_file(save_name))
+
+
+def is_run_available(journal, save_name, key=None, profile=None):
+    """Whether a run can be completed without the project: it is done, or in the run cache."""
+    return is_run_done(journal, save_name, key) or cached_run(key, profile) is not None
+
+
+def cached_run(key, profile=None):
+    """
+    The run cache entry of a key, if it has everything the job profile makes: a run
+    that downloads its model needs one with the model file. None otherwise.
+    """
+    cached = run_cache.lookup(key) if key else None
+    if cached is None:
+        return None
+    if job_profile(profile or DEFAULT_PROFILE)["download"] and not any(
+            name.endswith(".eim") for name in cached["files"][1:]):
+        print(f"Cached run {key[:12]} has no model file for the {profile} profile, running it again...")
+        return None
+    return cached
+
+
+def project_run(client):
+    """Journal entry of the impulse and features currently in the project (not of a single run)."""
+    return f"project_{client.project_id}"
+
+
+def reusable_impulse(journal, img_size, dsp_type, dataset_hash, client=None, profile=None):
+    """
+    The block IDs of the impulse in the project if its features were generated
+    for this image size, DSP type and dataset, with the feature options of the job profile, else None.
+    """
+    client = client or get_client()
+    entry = journal.get(project_run(client), "features")
+    if dataset_hash is None or entry is None or entry["status"] != DONE:
+        return None
+    state = entry["data"]
+    if (state["img_size"], state["dsp_type"], state["dataset"]) != (img_size, dsp_type, dataset_hash):
+        return None
+    # Features from before the job profiles were made like the default profile.
+    if state.get("options", job_profile(DEFAULT_PROFILE)["features"]) != job_profile(profile)["features"]:
+        return None
+
+    # Someone may have changed the impulse in the Studio in the meantime.
+    impulse = get_impulse(client, refresh=True)
+    if impulse is None:
+        return None
+    ids = {"dsp_id": state["dsp_id"], "learn_block_id": state["learn_block_id"]}
+    same_input = all(b.get("imageWidth") == img_size and b.get("imageHeight") == img_size
+                     for b in impulse["inputBlocks"])
+    same_dsp = [(b["id"], b["type"]) for b in impulse["dspBlocks"]] == [(ids["dsp_id"], dsp_type)]
+    if not (same_input and same_dsp and impulse_exists(ids, client, impulse)):
+        return None
+    return ids
+
+
+def impulse_exists(ids, client=None, impulse=None):
+    """Whether the impulse in the project still has the learn block we created."""
+    impulse = impulse or get_impulse(client, refresh=True)
+    return impulse is not None and any(b["id"] == ids["learn_block_id"] for b in impulse["learnBlocks"])
+
+
+def known_results(journal, save_name, key=None, profile=None):
+    """
+    Results of a run that need no training: its own, or those of an identical run
+    in the run cache (copied to its results file) that has everything the job profile
+    makes, see cached_run. Returns (done, accuracy).
+    """
+    # Tamara's input: Check if the results file already exists, if so, skip the training and testing.
+    if is_run_done(journal, save_name, key):
+        entry = journal.get(save_name, "results")
+        if entry and entry["data"] and entry["data"].get("aborted"):
+            print(f"Training of {save_name} was aborted before ({entry['data']['aborted']}), skipping...")
+        else:
+            print(f"Results for {save_name} already exist, skipping...")
+        return True, entry["data"]["accuracy"] if entry and entry["data"] else None
+    if journal.is_done(save_name, "results"):
+        print(f"Config of {save_name} changed since its results were made, running it again...")
+        journal.reset(save_name)
+        # They are still in the run cache under their old key.
+        if os.path.exists(results_file(save_name)):
+            os.remove(results_file(save_name))
+
+    cached = cached_run(key, profile)
+    if cached is not None:
+        print(f"Identical run found in the run cache ({key[:12]}), skipping training...")
+        json_file = results_file(save_name)
+        run_cache.restore(cached, cached["files"][0], json_file)
+        # The learning curve and the model file, if the run has them.
+        model = None
+        for name in cached["files"][1:]:
+            if name.startswith("curves_"):
+                run_cache.restore(cached, name, curves_file(save_name))
+            elif name.endswith(".eim"):
+                model = run_cache.restore(cached, name, model_file(save_name))
+        journal.finish(save_name, "results", {"accuracy": cached["accuracy"], "file": json_file, "model": model,
+                                              "model_type": (cached.get("config") or {}).get("model_type"),
+                                              "profile": cached.get("profile"), "key": key})
+        return True, cached["accuracy"]
+    return False, None
+
+
+def start_training(learn_block_id, model_type, client=None, hyperparameters=None, profile=None):
+    """Start the training job of a learn block for a model type, returns its job ID (None on failure)."""
+    if model_type == "transfer_efficientnet_b0":
+        job = train_efficientnet_model(learn_block_id, client, hyperparameters, profile)
+    else:
+        job = train_model(learn_block_id, model_type, client, hyperparameters, profile)
+    print(f"Job ID: {job.get('id')}")
+    return job.get("id")
+
+
+def save_curve(monitor, run):
+    """Read the rest of the log of a training job and save its learning curve."""
+    if monitor is None or monitor.job_id is None:
+        return None
+    monitor.update(check=False)
+    return monitor.save(curves_file(run))
+
+
+def record_aborted(journal, run, monitor, key=None, profile=None):
+    """Journal a run whose training was stopped by an abort rule as done, with the reason instead of an accuracy."""
+    print(f"Training of {run} was aborted ({monitor.reason}), it is not run again.")
+    journal.finish(run, "results", {"accuracy": None, "aborted": monitor.reason, "curves": curves_file(run),
+                                    "profile": profile or DEFAULT_PROFILE, "key": key})
+
+
+def train_test_automation(model_type, save_name, img_size, journal=None, client=None, dataset_hash=None,
+                          hyperparameters=None, samples=None, profile=None, timeouts=None, post=None,
+                          abort_rules=None, test_samples=None):
+    """
+    This function automates the process of training, testing, and downloading the Edge Impulse model.
+    Useful for testing how accuracy scales with dataset size, and different model types.
+    dataset_hash: fingerprint of the selected dataset (see ei_dataset_sync.py), enables the run cache.
+    hyperparameters: overrides of the training parameters, see training_payload in ei_train.py.
+    samples: number of samples in the dataset, recorded with the stage durations.
+    profile: the job profile, which optional work the server does (see job_profiles.py).
+    timeouts: configured time budgets of the jobs as {stage: seconds}, see stage_timeout.
+    post: a PostProcessor to save the results in the background.
+    abort_rules: rules to stop the training job early on its log (see job_logs.py), None for none.
+    test_samples: local test images [(path, label)] to evaluate the downloaded model on, see finish_runs.
+    Returns the accuracy of the model, or None when it is left to post or its training was aborted.
+    """
+    client = client or get_client()
+    journal = journal or Journal()
+    run = save_name
+    key, config = cache_key(model_type, img_size, dataset_hash, hyperparameters=hyperparameters, profile=profile) \
+        if dataset_hash else (None, None)
+
+    done, accuracy = known_results(journal, save_name, key, profile)
+    if done:
+        return accuracy
+    if post is not None:
+        # Everything below changes the impulse, the classify result or both.
+        post.barrier(client, RESULTS, IMPULSE)
+
+    ids = journal.get(run, "impulse")
+    if ids is not None and ids["status"] == DONE and impulse_exists(ids["data"], client):
+        ids = ids["data"]
+        print(f"Impulse of {run} already created, skipping...")
+    elif (ids := reusable_impulse(journal, img_size, "image", dataset_hash, client, profile)) is not None:
+        # Same features as the previous model, the learn block is simply trained again.
+        print(f"Impulse and features for {img_size}x{img_size} of this dataset are already there, reusing them...")
+        journal.reset(run)
+        journal.finish(run, "impulse", ids)
+        journal.finish(run, "features", {"reused": True})
+    else:
+        journal.reset(run)
+        journal.reset(project_run(client))
+        journal.start(run, "impulse")
+        print("Deleting old impulse...")
+        delete_impulse(client)
+
+        print("Creating impulse...")
+        create_impulse(name="MyImpulse", img_size=img_size, dsp_type="image", model_name=model_type, client=client)
+        ids = {"dsp_id": get_dsp_id(client), "learn_block_id": learn_block_id(client)}
+        if -1 in ids.values():
+            print("DSP or learn block ID not found.")
+            journal.fail(run, "impulse")
+            exit(1)
+        journal.finish(run, "impulse", ids)
+        print("Impulse created successfully.")
+    print(f"DSP block ID: {ids['dsp_id']} | Learn block ID: {ids['learn_block_id']}")
+
+    print("Generating features for the dataset...")
+    status = run_job_stage(journal, run, "features", "features",
+                           lambda: generate_features(ids["dsp_id"], client, profile), client,
+                           {"img_size": img_size, "samples": samples}, timeouts)
+    if status != SUCCESS:
+        print("Feature generation failed. Exiting.")
+        exit(1)
+    if dataset_hash:
+        journal.finish(project_run(client), "features",
+                       dict(ids, img_size=img_size, dsp_type="image", dataset=dataset_hash,
+                            options=job_profile(profile)["features"]))
+
+    monitor = TrainingMonitor(client=client, rules=abort_rules)
+    status = run_job_stage(journal, run, "train", "train",
+                           lambda: start_training(ids["learn_block_id"], model_type, client, hyperparameters, profile),
+                           client, {"model_type": model_type, "img_size": img_size, "samples": samples}, timeouts,
+                           monitor)
+    save_curve(monitor, run)
+    if status != SUCCESS and monitor.reason:
+        record_aborted(journal, run, monitor, key, profile)
+        return None
+    if status != SUCCESS:
+        # Maybe the features went stale after all, don't reuse them next time.
+        journal.reset(project_run(client))
+        print("Job failed. Exiting.")
+        exit(1)
+
+    print("Testing the model...")
+    status = run_job_stage(journal, run, "test", "test", lambda: test_model(client), client,
+                           {"img_size": img_size, "samples": samples}, timeouts)
+    if status != SUCCESS:
+        print("Model testing failed. Exiting.")
+        exit(1)
+
+    runs = [(run, ids["learn_block_id"], model_type, key, config)]
+    if post is None:
+        return finish_runs(journal, client, runs, profile, timeouts, test_samples=test_samples).get(run, -1)
+    holds = {resource: post.hold(client, resource) for resource in (RESULTS, IMPULSE, TEST_DATA)}
+    post.submit([run], finish_runs, journal, client, runs, profile, timeouts, holds, test_samples)
+    return None
+
+
+def finish_runs(journal, client, runs, profile=None, timeouts=None, holds=None, test_samples=None):
+    """
+    Everything after the test job of some runs on one impulse: fetch the classify
+    result, save the results file of every run and store it in the run cache.
+    If the job profile says so, the model file is built and downloaded as well,
+    and evaluated on the local test images (see evaluate_local).
+    runs: [(save_name, learn_block_id, model_type, key, config)], every run gets the result of its
+          learn block, see block_results in ei_test_results.py.
+    holds: {resource: Event} from PostProcessor.hold, set as soon as that state is read.
+    test_samples: the local test images of the selection as [(path, label)], None to skip the evaluation.
+    Returns {save_name: accuracy}.
+    """
+    holds = holds or {}
+    profile = profile or DEFAULT_PROFILE
+    try:
+        # Use the given save_name to create a unique json file name
+        results = test_results_per_block({block: results_file(run) for run, block, _, _, _ in runs}, client,
+                                         {block: model_type for _, block, model_type, _, _ in runs})
+        if RESULTS in holds:
+            holds[RESULTS].set()
+
+        status = FAILED
+        if job_profile(profile)["download"] and results is not None:
+            print("Building the model...")
+            started = time.time()
+            job_id = build_model(client)
+            budget = stage_timeout(journal, "build", None, timeouts)
+            if job_id is not None:
+                status = get_watcher(client).wait(job_id, "build", budget)
+            if status == SUCCESS or out_of_budget(status, time.time() - started, budget):
+                journal.record_duration("build", time.time() - started)
+        # The build has its own copy of the impulse, the download only fetches it.
+        if IMPULSE in holds:
+            holds[IMPULSE].set()
+        # One model file holds all learn blocks of the impulse, it is named after the first run.
+        model = download_model(model_file(runs[0][0]), client) if status == SUCCESS else None
+
+        local = None
+        if model is not None and test_samples and len(runs) == 1:
+            local = evaluate_local(model, test_samples, local_results_file(runs[0][0]))
+    finally:
+        # Whatever failed, the pipeline must not wait at a barrier for this task forever.
+        for event in holds.values():
+            event.set()
+
+    accuracies = {}
+    for run, block, model_type, key, config in runs:
+        if results is None:
+            journal.fail(run, "results")
+            continue
+        accuracies[run] = results[block]
+        journal.finish(run, "results", {"accuracy": results[block], "file": results_file(run), "model": model,
+                                        "local_accuracy": local, "model_type": model_type, "profile": profile,
+                                        "key": key})
+        if key:
+            files = [results_file(run)] + [f for f in (curves_file(run), model) if f and os.path.exists(f)]
+            run_cache.store(key, results[block], files, config, profile)
+        print(f"Model accuracy summary of {run}:", results[block])
+    return accuracies
+
+
+def evaluate_local(model, test_samples, json_file):
+    """
+    Classify the local test images with a downloaded model file, to check that the
+    .eim gives the accuracy of the test job. Saves the result of every image to
+    json_file and returns the accuracy, or None if the model could not be run here.
+    Only done for an impulse with one learn block: the .eim of several classifies with all of them.
+    """
+    print(f"Evaluating {model} on {len(test_samples)} local test images...")
+    try:
+        local = evaluate_model(model, test_samples)
+    except Exception as e:
+        # The results of the test job are there, a model that can not run here should not lose them.
+        print(f"❗ Local evaluation of {model} failed: {e!r}")
+        return None
+    with open(json_file, "w") as f:
+        json.dump(local, f, indent=2)
+    print(f"✅ Local accuracy of {model}: {local['accuracyScore']:.2f}, saved to {json_file}")
+    return local["accuracyScore"]
+
+
+def record_training(journal, model_type, img_size, samples, budget=None):
+    """
+    JobWatcher callback that records the duration of a training job started now,
+    also if it was cancelled for its budget.
+    """
+    started = time.time()
+
+    def callback(job_id, status):
+        seconds = time.time() - started
+        if status == SUCCESS or out_of_budget(status, seconds, budget):
+            journal.record_duration("train", seconds, model_type, img_size, samples)
+    return callback
+
+
+def train_test_parallel(model_types, save_names, img_size, journal=None, client=None, dataset_hash=None,
+                        hyperparameters=None, samples=None, profile=None, timeouts=None, post=None,
+                        abort_rules=None, test_samples=None):
+    """
+    Like train_test_automation, for several model types on the same dataset and image size.
+    All models get their own learn block on one impulse, so the features are
+    generated once and all training jobs run on the server at the same time.
+    One classify job tests them all, after which every learn block gets its own results file.
+    Returns {save_name: accuracy}, without the runs that are left to post.
+    """
+    client = client or get_client()
+    journal = journal or Journal()
+    accuracies = {}
+    pending = []
+    for model_type, save_name in zip(model_types, save_names):
+        key, config = cache_key(model_type, img_size, dataset_hash, hyperparameters=hyperparameters,
+                                profile=profile) if dataset_hash else (None, None)
+        done, accuracy = known_results(journal, save_name, key, profile)
+        if done:
+            accuracies[save_name] = accuracy
+        else:
+            pending.append((model_type, save_name, key, config))
+
+    if len(pending) == 1:
+        model_type, save_name, _, _ = pending[0]
+        accuracy = train_test_automation(model_type, save_name, img_size, journal, client, dataset_hash,
+                                         hyperparameters, samples, profile, timeouts, post, abort_rules,
+                                         test_samples)
+        if accuracy is not None:
+            accuracies[save_name] = accuracy
+    if len(pending) <= 1:
+        return accuracies
+    if post is not None:
+        post.barrier(client, RESULTS, IMPULSE)
+
+    runs = [save_name for _, save_name, _, _ in pending]
+    keys = {save_name: key for _, save_name, key, _ in pending}
+    entries = [journal.get(run, "impulse") for run in runs]
+    impulse = get_impulse(client, refresh=True) if all(e and e["status"] == DONE for e in entries) else None
+    if (impulse is not None and len({e["data"]["dsp_id"] for e in entries}) == 1
+            and all(impulse_exists(e["data"], client, impulse) for e in entries)):
+        ids = {run: entry["data"] for run, entry in zip(runs, entries)}
+        print("Impulse of these runs already created, skipping...")
+    else:
+        for run in runs:
+            journal.reset(run)
+            journal.start(run, "impulse")
+        journal.reset(project_run(client))
+        print("Deleting old impulse...")
+        delete_impulse(client)
+
+        print(f"Creating impulse with {len(runs)} learn blocks...")
+        impulse = create_impulse(name="MyImpulse", img_size=img_size, dsp_type="image",
+                                 model_names=[model_type for model_type, _, _, _ in pending], client=client)
+        if impulse is None:
+            for run in runs:
+                journal.fail(run, "impulse")
+            print("Creating impulse failed. Exiting.")
+            exit(1)
+        dsp_id = impulse["dspBlocks"][0]["id"]
+        ids = {}
+        for run, block in zip(runs, impulse["learnBlocks"]):
+            ids[run] = {"dsp_id": dsp_id, "learn_block_id": block["id"]}
+            journal.finish(run, "impulse", ids[run])
+
+    # Stages that are shared by all runs are journaled under the first one.
+    lead = runs[0]
+    print("Generating features for the dataset...")
+    if not journal.is_done(lead, "features"):
+        for run in runs[1:]:
+            journal.reset(run, STAGES[STAGES.index("features"):])
+    status = run_job_stage(journal, lead, "features", "features",
+                           lambda: generate_features(ids[lead]["dsp_id"], client, profile), client,
+                           {"img_size": img_size, "samples": samples}, timeouts)
+    if status != SUCCESS:
+        print("Feature generation failed. Exiting.")
+        exit(1)
+    for run in runs[1:]:
+        if not journal.is_done(run, "features"):
+            journal.finish(run, "features", {"shared_with": lead})
+
+    watcher = get_watcher(client)
+    futures = {}
+    monitors = {}
+    for model_type, run, _, _ in pending:
+        entry = journal.get(run, "train")
+        if entry is not None and entry["status"] == DONE:
+            print(f"train of {run} already done, skipping...")
+            continue
+        budget = stage_timeout(journal, "train", {"model_type": model_type, "img_size": img_size, "samples": samples},
+                               timeouts)
+        if entry is not None and entry["status"] == RUNNING and entry["job_id"] is not None:
+            print(f"Re-attaching to train job {entry['job_id']} of {run}...")
+            job_id = entry["job_id"]
+            callback = None  # We don't know when it started.
+        else:
+            journal.reset(run, STAGES[STAGES.index("test"):])
+            job_id = start_training(ids[run]["learn_block_id"], model_type, client, hyperparameters, profile)
+            if job_id is None:
+                journal.fail(run, "train")
+                continue
+            journal.start(run, "train", job_id)
+            # Every job is timed on its own, they finish at different moments.
+            callback = record_training(journal, model_type, img_size, samples, budget)
+        monitors[run] = TrainingMonitor(job_id, client, abort_rules)
+        futures[run] = watcher.watch(job_id, "train", callback, budget, monitors[run])
+
+    print(f"Training {len(futures)} models in parallel...")
+    for run, future in futures.items():
+        status = future.result()
+        save_curve(monitors[run], run)
+        if status == SUCCESS:
+            journal.finish(run, "train")
+        else:
+            journal.fail(run, "train")
+            if monitors[run].reason:
+                record_aborted(journal, run, monitors[run], keys[run], profile)
+    trained = [run for run in runs if journal.is_done(run, "train")]
+    failed = [run for run in runs if run not in trained and not is_run_done(journal, run, keys[run])]
+    if not trained and not failed:
+        return accuracies
+    if not trained:
+        print("All training jobs failed. Exiting.")
+        exit(1)
+
+    print("Testing the models...")
+    if not all(journal.is_done(run, "test") for run in trained):
+        journal.reset(trained[0], STAGES[STAGES.index("test"):])
+    status = run_job_stage(journal, trained[0], "test", "test", lambda: test_model(client), client,
+                           {"img_size": img_size, "samples": samples}, timeouts)
+    if status != SUCCESS:
+        print("Model testing failed. Exiting.")
+        exit(1)
+    for run in trained[1:]:
+        if not journal.is_done(run, "test"):
+            journal.finish(run, "test", {"shared_with": trained[0]})
+
+    # Every learn block gets its own results file, named after its run.
+    finished = [(run, ids[run]["learn_block_id"], model_type, key, config)
+                for model_type, run, key, config in pending if run in trained]
+    if post is None:
+        accuracies.update(finish_runs(journal, client, finished, profile, timeouts, test_samples=test_samples))
+    else:
+        holds = {resource: post.hold(client, resource) for resource in (RESULTS, IMPULSE, TEST_DATA)}
+        post.submit(trained, finish_runs, journal, client, finished, profile, timeouts, holds, test_samples)
+
+    if failed:
+        print(f"Training failed for {', '.join(failed)}. Exiting.")
+        exit(1)
+    return accuracies
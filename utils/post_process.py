@@ -0,0 +1,86 @@
+"""
+Background post-processing of finished runs, so it overlaps with the next run.
+
+After the test job of a run only little has to happen on the server: fetching
+the classify result and, for a model download, the build job. The rest (saving
+the results files, the run cache, downloading the .eim and evaluating it on the
+local test images) is local. A
+PostProcessor runs all of it in background threads, while the pipeline moves on
+to the next selection, impulse and training of the project.
+
+A task only needs the remote state of the project until it has read it. So it
+holds that state (see hold) and the pipeline calls barrier before changing it:
+    RESULTS: the classify result, changed by selecting another dataset or testing
+    IMPULSE: the impulse and its trained weights, changed by a new impulse or training
+    TEST_DATA: the local test images, changed when the folders are re-created for another seed
+Everything after the last hold is released runs entirely in the background.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+RESULTS = "results"
+IMPULSE = "impulse"
+TEST_DATA = "test data"
+
+POST_WORKERS = 4
+
+
+class PostProcessor:
+    """Runs post-processing tasks in the background, with barriers per project."""
+
+    def __init__(self, max_workers=POST_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._holds = {}  # (project_id, resource) -> [Event]
+        self._tasks = []  # (runs, future)
+
+    def hold(self, client, resource):
+        """
+        Keep the pipeline from changing a remote resource of a project until the
+        returned Event is set. Taken before the task is submitted, so no change slips in.
+        """
+        event = threading.Event()
+        with self._lock:
+            self._holds.setdefault((client.project_id, resource), []).append(event)
+        return event
+
+    def barrier(self, client, *resources):
+        """Wait until the background tasks are done with these remote resources of a project."""
+        with self._lock:
+            events = [event for resource in resources
+                      for event in self._holds.pop((client.project_id, resource), [])]
+        for event in events:
+            event.wait()
+
+    def submit(self, runs, fn, *args):
+        """
+        Run fn(*args) in the background for some runs (save_names).
+        fn returns {save_name: accuracy}.
+        """
+        future = self._executor.submit(fn, *args)
+        with self._lock:
+            self._tasks.append((set(runs), future))
+        return future
+
+    def _futures(self, runs=None):
+        with self._lock:
+            return [future for task_runs, future in self._tasks if runs is None or task_runs & set(runs)]
+
+    def done(self, runs=None):
+        """Whether the tasks of these runs (or all) are finished."""
+        return all(future.done() for future in self._futures(runs))
+
+    def results(self, runs=None):
+        """Wait for the tasks of these runs (or all) and return {save_name: accuracy}."""
+        futures = self._futures(runs)
+        wait(futures)
+        accuracies = {}
+        for future in futures:
+            try:
+                accuracies.update(future.result())
+            except Exception as e:
+                print(f"❌ Post-processing failed: {e!r}")
+        return accuracies
+
+    def close(self):
+        self._executor.shutdown(wait=True)
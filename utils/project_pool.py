@@ -0,0 +1,93 @@
+"""
+A pool of Edge Impulse projects, to run independent experiment runs in parallel.
+
+Every project has its own API client (see ei_client.py), impulse, job watcher
+and dataset. A worker leases a project for a group of runs and gives it back
+afterwards. The pool remembers which dataset variants every project holds in
+this session, so a run goes to a project that already has its data if one is
+idle and the data is only replicated to another project when needed.
+
+The projects are read from .env:
+EI_PROJECTS=<projectId>:<apiKey>,<projectId>:<apiKey>,...
+and default to the single EI_PROJECT_ID / EI_API_KEY project.
+
+Usage:
+python -m utils.project_pool     # check that every project in the pool is reachable
+"""
+import os
+import threading
+from contextlib import contextmanager
+from utils.ei_client import get_client
+
+
+def parse_projects(value):
+    """[(project_id, api_key)] from "id:key,id:key"."""
+    projects = []
+    for entry in value.split(","):
+        if entry.strip():
+            project_id, api_key = entry.strip().split(":", 1)
+            projects.append((project_id, api_key))
+    return projects
+
+
+class ProjectPool:
+    """Lease projects (as their EIClient) to one worker at a time."""
+
+    def __init__(self, clients):
+        self.clients = list(clients)
+        if not self.clients:
+            raise ValueError("A project pool needs at least one project.")
+        self._idle = list(self.clients)
+        self._cond = threading.Condition()
+        self.holds = {client.project_id: set() for client in self.clients}  # project_id -> {(dataset, seed)}
+
+    def __len__(self):
+        return len(self.clients)
+
+    @contextmanager
+    def lease(self, variant=None):
+        """
+        Wait for an idle project and lease it, preferring one that holds the
+        given (dataset, seed) variant already.
+        """
+        with self._cond:
+            while not self._idle:
+                self._cond.wait()
+            client = next((c for c in self._idle if variant in self.holds[c.project_id]), self._idle[0])
+            self._idle.remove(client)
+        try:
+            yield client
+        finally:
+            with self._cond:
+                self._idle.append(client)
+                self._cond.notify()
+
+    def has_variant(self, client, variant):
+        with self._cond:
+            return variant in self.holds[client.project_id]
+
+    def add_variant(self, client, variant):
+        """
+        Record that a project holds a dataset variant. Other seeds of the same
+        dataset may have been re-split into it, so they are forgotten.
+        """
+        with self._cond:
+            held = self.holds[client.project_id]
+            held.difference_update({v for v in held if v[0] == variant[0]})
+            held.add(variant)
+
+
+def load_pool(max_projects=None):
+    """The pool of projects in EI_PROJECTS, or of the default project."""
+    projects = parse_projects(os.getenv("EI_PROJECTS", ""))
+    clients = [get_client(api_key, project_id) for project_id, api_key in projects] or [get_client()]
+    return ProjectPool(clients[:max_projects] if max_projects else clients)
+
+
+if __name__ == "__main__":
+
+    pool = load_pool()
+    for client in pool.clients:
+        data = client.call("GET", "", "get project info")
+        if data is not None:
+            print(f"✅ Project {client.project_id}: {data.get('project', {}).get('name')}")
@@ -0,0 +1,101 @@
+"""
+Content-addressed cache of finished runs, so identical configurations are never trained twice.
+
+A run is identified by a hash of everything that determines its outcome:
+the dataset contents (see dataset_fingerprint in ei_dataset_sync.py), the impulse
+config (img_size, dsp_type), the model type and the full training payload.
+Renaming a dataset folder or a save_name still hits the cache, while changing
+a hyperparameter in training_payload misses it.
+
+Every run gets a folder with its summary and a copy of its artifacts:
+    .run_cache/<key>/run.json
+    .run_cache/<key>/results_<save_name>.json
+
+Usage:
+python -m utils.run_cache            # list the cached runs
+python -m utils.run_cache KEY        # show one run
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+CACHE_DIR = ".run_cache"
+
+
+def run_config(dataset_hash, img_size, dsp_type, model_type, payload):
+    """Everything that determines the outcome of a run."""
+    return {
+        "dataset": dataset_hash,
+        "img_size": img_size,
+        "dsp_type": dsp_type,
+        "model_type": model_type,
+        "payload": payload,
+    }
+
+
+def run_key(config):
+    """Hash of the config of a run. Key order in the payload does not matter."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def run_dir(key):
+    return os.path.join(CACHE_DIR, key)
+
+
+def lookup(key):
+    """The stored run for this key as a dict, or None if it was never done."""
+    path = os.path.join(run_dir(key), "run.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def store(key, accuracy, files=(), config=None, profile=None):
+    """
+    Store a finished run: its accuracy, a copy of its artifacts and (for reference)
+    the config it was trained with and its job profile (see job_profiles.py).
+    Returns the stored entry.
+    """
+    directory = run_dir(key)
+    os.makedirs(directory, exist_ok=True)
+    for path in files:
+        shutil.copyfile(path, os.path.join(directory, os.path.basename(path)))
+    entry = {
+        "key": key,
+        "accuracy": accuracy,
+        "files": [os.path.basename(path) for path in files],
+        "config": config,
+        "profile": profile,
+        "created": time.time(),
+    }
+    tmp = os.path.join(directory, "run.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(tmp, os.path.join(directory, "run.json"))
+    return entry
+
+
+def restore(entry, file_name, dest):
+    """Copy a cached artifact of a run to dest, e.g. the results file under a new save_name."""
+    shutil.copyfile(os.path.join(run_dir(entry["key"]), file_name), dest)
+    return dest
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Show the cached experiment runs.")
+    parser.add_argument("key", nargs="?", default=None)
+    args = parser.parse_args()
+
+    if args.key:
+        print(json.dumps(lookup(args.key), indent=2))
+    elif os.path.isdir(CACHE_DIR):
+        for key in sorted(os.listdir(CACHE_DIR)):
+            entry = lookup(key)
+            if entry:
+                config = entry["config"] or {}
+                print(key[:12], config.get("model_type"), config.get("img_size"), entry["accuracy"])
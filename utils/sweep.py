@@ -0,0 +1,308 @@
+"""
+Successive halving sweeps over the training parameters of a Keras transfer model.
+
+A full grid of learning rates, batch sizes and dropout rates at 20 training
+cycles each costs far too much compute. A sweep trains every configuration of
+the grid with a few cycles first, ranks them on validation accuracy and trains
+only the best 1/eta of them again, with eta times as many cycles, until
+max_cycles. With min_cycles 5, max_cycles 20 and eta 3, 24 configurations take
+    24 x 5 cycles -> 8 x 15 cycles -> 3 x 20 cycles
+instead of 24 x 20 cycles. Edge Impulse starts every training job from scratch,
+so a promoted configuration is trained again with its larger budget.
+
+A sweep is a JSON config (see experiments/ in the repository root):
+{
+  "name": "sweep_96",
+  "model": "transfer_mobilenetv2_a35",
+  "img_size": 96,
+  "space": {"learningRate": [0.0001, 0.0005, 0.001], "batchSize": [16, 32], "dropoutRate": [0.1, 0.5]},
+  "trials": null,             # optional, a random sample of this many configurations instead of the full grid
+  "min_cycles": 5,
+  "max_cycles": 20,
+  "eta": 3,
+  "parallel": 4,              # learn blocks, so training jobs, at the same time
+  "profile": "screening",     # see job_profiles.py
+  "abort_rules": {}           # see job_logs.py, null for none
+}
+The keys of "space" are keys of the training payload (training_payload in ei_train.py).
+
+The sweep runs on the dataset that is selected in the project. It creates one
+impulse with "parallel" learn blocks of the model, so the features are generated
+once and the trials are trained side by side, and reads the validation accuracy
+from the log of every training job (job_logs.py). Every trial is journaled by its
+configuration (experiment_journal.py), so a sweep resumes where it stopped, also
+after the space was changed, and waits for the training jobs that were still
+running. The ranking is saved to sweep_<name>.json, the best configuration can
+go into the "hyperparameters" of an experiment.
+
+Usage:
+python -m utils.sweep experiments/sweep_96.json
+python -m utils.sweep experiments/sweep_96.json --dry-run    # only show the rungs
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+from concurrent.futures import FIRST_COMPLETED, wait
+from utils.ei_client import get_client
+from utils.ei_create_impulse import create_impulse
+from utils.ei_delete_impulse import delete_impulse
+from utils.ei_generate_features import generate_features
+from utils.ei_get_ids import get_impulse
+from utils.ei_metrics import install_metrics
+from utils.ei_train import train_model
+from utils.experiment_journal import DONE, RUNNING, Journal
+from utils.job_logs import TrainingMonitor, merge_rules
+from utils.job_profiles import job_profile
+from utils.job_status import ABORT, SUCCESS, get_watcher, install_cleanup
+from utils.pipeline import project_run, run_job_stage, stage_timeout
+
+SWEEP_DEFAULTS = {
+    "img_size": 96,
+    "trials": None,
+    "min_cycles": 5,
+    "max_cycles": 20,
+    "eta": 3,
+    "parallel": 4,
+    "profile": "screening",
+    "abort_rules": {},
+    "timeouts": {},
+}
+
+
+def load_sweep(path):
+    """Read a sweep config and fill in the defaults."""
+    with open(path) as f:
+        sweep = dict(SWEEP_DEFAULTS, **json.load(f))
+    # Its epochs are in customParameters, see ei_train_efficientnet.py.
+    if sweep["model"] == "transfer_efficientnet_b0":
+        raise ValueError("Sweeps only work for the Keras transfer models of ei_train.py.")
+    if sweep["eta"] < 2:
+        raise ValueError("A sweep needs eta >= 2, or nothing is ever dropped.")
+    job_profile(sweep["profile"])
+    return sweep
+
+
+def configurations(space, trials=None, seed=0):
+    """Every combination of the values in space, or a random sample of trials of them."""
+    keys = sorted(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+    if trials and trials < len(grid):
+        grid = random.Random(seed).sample(grid, trials)
+    return grid
+
+
+def rungs(min_cycles, max_cycles, eta):
+    """The training cycles of every rung: min_cycles times a power of eta, up to max_cycles."""
+    cycles = []
+    budget = min_cycles
+    while budget < max_cycles:
+        cycles.append(budget)
+        budget *= eta
+    return cycles + [max_cycles]
+
+
+def rung_sizes(n, n_rungs, eta):
+    """How many trials every rung trains: the best 1/eta of the previous one, at least one."""
+    return [max(1, math.ceil(n / eta ** k)) for k in range(n_rungs)]
+
+
+def trial_run(sweep, config, cycles):
+    """
+    Journal name of one configuration at one budget. It is keyed by the configuration,
+    not its place in the grid, which moves when the space or the number of trials changes.
+    """
+    trained = dict(config, model=sweep["model"], img_size=sweep["img_size"])
+    digest = hashlib.sha256(json.dumps(trained, sort_keys=True).encode()).hexdigest()[:10]
+    return f"{sweep['name']}_{digest}_c{cycles}"
+
+
+def validation_accuracy(monitor):
+    """Validation accuracy of the last epoch in the log of a training job, or None."""
+    for point in reversed(monitor.curve):
+        if "val_accuracy" in point:
+            return point["val_accuracy"]
+    return None
+
+
+def prepare_impulse(sweep, journal, client):
+    """
+    The learn block IDs of the sweep impulse: one DSP block with the features of
+    the selected dataset and "parallel" learn blocks of the model.
+    """
+    run = sweep["name"]
+    entry = journal.get(run, "impulse")
+    impulse = get_impulse(client, refresh=True) if entry is not None and entry["status"] == DONE else None
+    if impulse is not None and {b["id"] for b in impulse["learnBlocks"]} >= set(entry["data"]["learn_block_ids"]):
+        ids = entry["data"]
+        print(f"Impulse of {run} already created, skipping...")
+    else:
+        journal.reset(run)
+        # The features in the project are not those of any run anymore.
+        journal.reset(project_run(client))
+        print("Deleting old impulse...")
+        delete_impulse(client)
+        print(f"Creating impulse with {sweep['parallel']} learn blocks...")
+        impulse = create_impulse(name="MyImpulse", img_size=sweep["img_size"], dsp_type="image",
+                                 model_names=[sweep["model"]] * sweep["parallel"], client=client)
+        if impulse is None:
+            print("Creating impulse failed. Exiting.")
+            exit(1)
+        ids = {"dsp_id": impulse["dspBlocks"][0]["id"],
+               "learn_block_ids": [block["id"] for block in impulse["learnBlocks"]]}
+        journal.finish(run, "impulse", ids)
+
+    print("Generating features for the dataset...")
+    status = run_job_stage(journal, run, "features", "features",
+                           lambda: generate_features(ids["dsp_id"], client, sweep["profile"]), client,
+                           {"img_size": sweep["img_size"]}, sweep["timeouts"])
+    if status != SUCCESS:
+        print("Feature generation failed. Exiting.")
+        exit(1)
+    return ids["learn_block_ids"]
+
+
+def run_rung(sweep, trials, cycles, learn_blocks, journal, client):
+    """
+    Train the trials [(trial, config)] with a number of cycles, one per learn block at a time.
+    learn_blocks: returns the learn block IDs, only called if there is something to train.
+    Returns {trial: validation accuracy}, None for a trial that failed or was aborted.
+    """
+    watcher = get_watcher(client)
+    rules = merge_rules(sweep["abort_rules"])
+    budget = stage_timeout(journal, "train", {"model_type": sweep["model"], "img_size": sweep["img_size"]},
+                           sweep["timeouts"])
+    scores = {}
+    todo = []
+    for trial, config in trials:
+        entry = journal.get(trial_run(sweep, config, cycles), "results")
+        if entry is not None and entry["status"] == DONE and entry["data"].get("config") == config:
+            scores[trial] = entry["data"]["accuracy"]
+        else:
+            todo.append((trial, config))
+    if len(todo) < len(trials):
+        print(f"{len(trials) - len(todo)} trials with {cycles} cycles already done, skipping...")
+
+    idle = list(learn_blocks()) if todo else []
+    running = {}  # future -> (trial, config, block, monitor, re-attached)
+    for trial, config in list(todo):
+        # A job that was still running when we stopped is waited for instead of restarted.
+        run = trial_run(sweep, config, cycles)
+        entry = journal.get(run, "train")
+        if entry is None or entry["status"] != RUNNING or entry["job_id"] is None:
+            continue
+        block = (entry["data"] or {}).get("block")
+        if block not in idle:
+            continue  # The impulse was created again, the job trains a block that is gone.
+        print(f"Re-attaching to train job {entry['job_id']} of {run}...")
+        todo.remove((trial, config))
+        idle.remove(block)
+        monitor = TrainingMonitor(entry["job_id"], client, rules)
+        running[watcher.watch(entry["job_id"], "train", None, budget, monitor)] = (trial, config, block, monitor, True)
+    while (todo or running) and not ABORT.is_set():
+        while todo and idle:
+            trial, config = todo.pop(0)
+            block = idle.pop(0)
+            run = trial_run(sweep, config, cycles)
+            job = train_model(block, sweep["model"], client, dict(config, trainingCycles=cycles), sweep["profile"])
+            if not job or job.get("id") is None:
+                journal.fail(run, "train")
+                scores[trial] = None
+                idle.append(block)
+                continue
+            journal.start(run, "train", job["id"], {"config": config, "cycles": cycles, "block": block})
+            monitor = TrainingMonitor(job["id"], client, rules)
+            running[watcher.watch(job["id"], "train", None, budget, monitor)] = (trial, config, block, monitor, False)
+        if not running:
+            continue
+        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in finished:
+            trial, config, block, monitor, attached = running.pop(future)
+            idle.append(block)
+            run = trial_run(sweep, config, cycles)
+            monitor.update(check=False)
+            accuracy = validation_accuracy(monitor) if future.result() == SUCCESS else None
+            if accuracy is None and attached and not monitor.reason:
+                print(f"Train job {monitor.job_id} of {run} did not succeed, starting it again.")
+                todo.append((trial, config))
+                continue
+            scores[trial] = accuracy
+            if accuracy is None:
+                journal.fail(run, "train")
+                continue
+            journal.finish(run, "train")
+            journal.finish(run, "results", {"accuracy": accuracy, "config": config, "cycles": cycles,
+                                            "job_id": monitor.job_id, "curve": monitor.curve})
+    return scores
+
+
+def print_ranking(trials, scores, cycles):
+    print(f"Rung with {cycles} cycles:")
+    # Failed trials last, a score of 0.0 is still a score.
+    for trial, config in sorted(trials, key=lambda t: (scores.get(t[0]) is None, -(scores.get(t[0]) or 0))):
+        score = scores.get(trial)
+        print(f"  t{trial:02d} {'failed' if score is None else f'{score:.4f}':>8}  {json.dumps(config)}")
+
+
+def run_sweep(sweep, journal=None, client=None, dry_run=False):
+    """
+    Run a successive halving sweep, see the module docstring.
+    Returns the trials of the last rung as [{"trial", "config", "cycles", "accuracy"}], best first.
+    """
+    configs = configurations(sweep["space"], sweep["trials"])
+    budgets = rungs(sweep["min_cycles"], sweep["max_cycles"], sweep["eta"])
+    sizes = rung_sizes(len(configs), len(budgets), sweep["eta"])
+    total = sum(n * cycles for n, cycles in zip(sizes, budgets))
+    print(f"Sweep {sweep['name']}: {len(configs)} configurations of {sweep['model']} at {sweep['img_size']}x"
+          f"{sweep['img_size']}, " + " -> ".join(f"{n} x {c} cycles" for n, c in zip(sizes, budgets)))
+    print(f"{total} training cycles, instead of {len(configs) * sweep['max_cycles']} for the full grid.")
+    if dry_run:
+        return []
+
+    client = client or get_client()
+    journal = journal or Journal()
+    blocks = []
+
+    def learn_blocks():
+        if not blocks:
+            blocks.extend(prepare_impulse(sweep, journal, client))
+        return blocks
+    trials = list(enumerate(configs))
+    ranking = []
+    for n, cycles in zip(sizes, budgets):
+        trials = trials[:n]
+        scores = run_rung(sweep, trials, cycles, learn_blocks, journal, client)
+        if ABORT.is_set():
+            print("❗ Sweep stopped.")
+            exit(1)
+        print_ranking(trials, scores, cycles)
+        # Failed trials drop out, the rest is promoted best first.
+        trials = sorted([t for t in trials if scores.get(t[0]) is not None], key=lambda t: -scores[t[0]])
+        if not trials:
+            print("❌ All trials of this rung failed. Exiting.")
+            exit(1)
+        ranking = [{"trial": trial, "config": config, "cycles": cycles, "accuracy": scores[trial]}
+                   for trial, config in trials]
+
+    path = f"sweep_{sweep['name']}.json"
+    with open(path, "w") as f:
+        json.dump({"sweep": sweep, "ranking": ranking}, f, indent=2)
+    print(f"✅ Best configuration ({ranking[0]['accuracy']:.4f}): {json.dumps(ranking[0]['config'])}, saved {path}")
+    return ranking
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Run a successive halving sweep over training parameters.")
+    parser.add_argument("config", type=str, help="Path to the sweep config (JSON).")
+    parser.add_argument("--dry-run", action="store_true", help="Only show the rungs of the sweep.")
+    args = parser.parse_args()
+
+    sweep = load_sweep(args.config)
+    if not args.dry_run:
+        # Ctrl-C cancels the training jobs on the server.
+        install_cleanup()
+        install_metrics()
+    run_sweep(sweep, dry_run=args.dry_run)
@@ -0,0 +1,269 @@
+"""
+A work queue of experiment runs that several workers, also on different machines, take from.
+
+run_experiment.py --queue enqueues the chunk selections of an experiment plan
+(see experiment_plan.py), every one a task with the train stages of all image
+sizes on it. Workers (run_worker.py) lease a task, run it on their own projects
+and publish the results. A lease has to be renewed by a heartbeat; when a worker
+dies its leases expire and the tasks are taken up by another worker.
+
+The queue is a SQLite database, e.g. on a shared drive. Next to it the workers
+publish the results files of their runs:
+    <queue>.db
+    results/results_<save_name>.json
+
+Every worker plans the experiment from its own checkout, so the tasks only hold
+the stage IDs, and keeps its own experiment journal and dataset folders.
+
+Usage:
+python -m utils.work_queue queue.db                  # show the tasks of the queue
+python -m utils.work_queue queue.db --retry exp_2    # put the failed tasks of exp_2 back in the queue
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class WorkQueue:
+    """SQLite-backed tasks with leases, shared by all workers of a sweep."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # The default 5 s busy timeout is too short for a queue on a network drive.
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS experiments (
+                name TEXT PRIMARY KEY,
+                config TEXT NOT NULL
+            )""")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                experiment TEXT NOT NULL,
+                id TEXT NOT NULL,
+                seed INTEGER,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                updated REAL NOT NULL,
+                PRIMARY KEY (experiment, id)
+            )""")
+
+    def _transaction(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same task.
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+                self._db.execute("COMMIT")
+                return result
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, config, tasks):
+        """
+        Add the tasks [(task_id, seed)] of an experiment, in the order they should run.
+        Tasks that are queued already keep their status. Returns the number of new tasks.
+        """
+        def add(db):
+            db.execute("INSERT OR REPLACE INTO experiments (name, config) VALUES (?, ?)",
+                       (config["name"], json.dumps(config)))
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (experiment, id, seed, position, status, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(config["name"], task_id, seed, position, PENDING, time.time())
+                 for position, (task_id, seed) in enumerate(tasks)])
+            return db.total_changes - before
+        return self._transaction(add)
+
+    def config(self, experiment):
+        """The config an experiment was enqueued with, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT config FROM experiments WHERE name = ?", (experiment,)).fetchone()
+        if row is None:
+            return None
+        config = json.loads(row[0])
+        config["models"] = {int(size): models for size, models in config["models"].items()}
+        return config
+
+    def claim(self, experiment, worker, seed=None, only_seed=False, lease=LEASE_SECONDS):
+        """
+        Lease the next pending (or expired) task of an experiment to a worker, preferring
+        tasks of the given seed, whose dataset folders the worker has on disk already.
+        Returns the task as a dict, or None if there is nothing to do right now.
+        """
+        def take(db):
+            now = time.time()
+            row = db.execute(
+                "SELECT id, seed, attempts FROM tasks WHERE experiment = ? "
+                "AND (status = ? OR (status = ? AND lease_until < ?)) "
+                + ("AND seed IS ? " if only_seed else "") +
+                "ORDER BY seed IS ? DESC, position LIMIT 1",
+                (experiment, PENDING, LEASED, now) + ((seed,) if only_seed else ()) + (seed,)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE experiment = ? AND id = ?",
+                (LEASED, worker, now + lease, now, experiment, row[0]))
+            return {"experiment": experiment, "id": row[0], "seed": row[1], "attempts": row[2] + 1}
+        return self._transaction(take)
+
+    def heartbeat(self, worker, lease=LEASE_SECONDS):
+        """Renew all leases of a worker. Returns the IDs of the tasks it still holds."""
+        def renew(db):
+            now = time.time()
+            db.execute("UPDATE tasks SET lease_until = ? WHERE worker = ? AND status = ?",
+                       (now + lease, worker, LEASED))
+            return {row[0] for row in db.execute(
+                "SELECT id FROM tasks WHERE worker = ? AND status = ?", (worker, LEASED))}
+        return self._transaction(renew)
+
+    def complete(self, task, worker, result):
+        """
+        Mark a task done with its result ({save_name: accuracy}). Returns False if the
+        lease was lost meanwhile, in which case another worker redoes the task.
+        """
+        return self._finish(task, worker, DONE, result)
+
+    def fail(self, task, worker, error=None):
+        """Give a task back after an error, or mark it failed after MAX_ATTEMPTS."""
+        status = FAILED if task["attempts"] >= MAX_ATTEMPTS else PENDING
+        return self._finish(task, worker, status, {"error": error} if error else None)
+
+    def _finish(self, task, worker, status, result):
+        def update(db):
+            cursor = db.execute(
+                "UPDATE tasks SET status = ?, worker = ?, lease_until = NULL, result = ?, updated = ? "
+                "WHERE experiment = ? AND id = ? AND worker = ? AND status = ?",
+                (status, worker if status != PENDING else None,
+                 json.dumps(result) if result is not None else None, time.time(),
+                 task["experiment"], task["id"], worker, LEASED))
+            return cursor.rowcount == 1
+        return self._transaction(update)
+
+    def release(self, worker):
+        """
+        Give back all leases of a worker that stops, without counting it as an attempt.
+        Returns the number of released tasks.
+        """
+        def reset(db):
+            return db.execute(
+                "UPDATE tasks SET status = ?, worker = NULL, lease_until = NULL, attempts = attempts - 1, "
+                "updated = ? WHERE worker = ? AND status = ?",
+                (PENDING, time.time(), worker, LEASED)).rowcount
+        return self._transaction(reset)
+
+    def retry(self, experiment):
+        """Put the failed tasks of an experiment back in the queue."""
+        def reset(db):
+            return db.execute(
+                "UPDATE tasks SET status = ?, worker = NULL, attempts = 0, updated = ? "
+                "WHERE experiment = ? AND status = ?",
+                (PENDING, time.time(), experiment, FAILED)).rowcount
+        return self._transaction(reset)
+
+    def counts(self, experiment):
+        """Number of tasks of an experiment per status. Expired leases count as pending."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT CASE WHEN status = ? AND lease_until < ? THEN ? ELSE status END, COUNT(*) "
+                "FROM tasks WHERE experiment = ? GROUP BY 1",
+                (LEASED, time.time(), PENDING, experiment)).fetchall()
+        counts = {status: 0 for status in (PENDING, LEASED, DONE, FAILED)}
+        counts.update(dict(rows))
+        return counts
+
+    def tasks(self, experiment=None):
+        """All tasks as dicts, in queue order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT experiment, id, status, worker, lease_until, attempts, result FROM tasks "
+                + ("WHERE experiment = ? " if experiment else "") + "ORDER BY experiment, position",
+                (experiment,) if experiment else ()).fetchall()
+        return [{"experiment": r[0], "id": r[1], "status": r[2], "worker": r[3], "lease_until": r[4],
+                 "attempts": r[5], "result": json.loads(r[6]) if r[6] else None} for r in rows]
+
+    def experiments(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT name FROM experiments ORDER BY name")]
+
+    def results_dir(self):
+        """The shared folder next to the queue that the workers publish their results files to."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.path)), "results")
+
+    def publish(self, files):
+        """Copy results files to the shared results folder."""
+        os.makedirs(self.results_dir(), exist_ok=True)
+        for path in files:
+            tmp = os.path.join(self.results_dir(), os.path.basename(path) + ".tmp")
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, os.path.join(self.results_dir(), os.path.basename(path)))
+
+    def close(self):
+        self._db.close()
+
+
+class Heartbeat:
+    """Renews the leases of a worker in the background, every third of the lease time."""
+
+    def __init__(self, queue, worker, lease=LEASE_SECONDS):
+        self.queue = queue
+        self.worker = worker
+        self.lease = lease
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self.queue.heartbeat(self.worker, self.lease)
+            except sqlite3.OperationalError as e:
+                # The next beat may get through, the lease has some slack.
+                print(f"❌ Heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Show or edit a work queue of experiment runs.")
+    parser.add_argument("path", type=str, help="Path to the queue database.")
+    parser.add_argument("--retry", type=str, default=None, help="Put the failed tasks of this experiment back.")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.path)
+    if args.retry:
+        print(f"Put {queue.retry(args.retry)} failed tasks of {args.retry} back in the queue.")
+    for experiment in queue.experiments():
+        counts = queue.counts(experiment)
+        print(f"{experiment}: " + ", ".join(f"{n} {status}" for status, n in counts.items()))
+        for task in queue.tasks(experiment):
+            if task["status"] == LEASED:
+                print(f"  {task['id']} leased by {task['worker']} "
+                      f"until {time.strftime('%H:%M:%S', time.localtime(task['lease_until']))}")
+            elif task["status"] == FAILED:
+                print(f"  {task['id']} failed after {task['attempts']} attempts: {(task['result'] or {}).get('error')}")